@@ -0,0 +1,82 @@
+'''
+    Адаптивные вероятности генетических операторов.
+    --------
+
+    Для каждого оператора (`OPERATORS`) и каждой специализации хранится
+    вероятность применить оператор к перестановке этой специализации.
+    После оценки поколения для каждой пары (оператор, специализация)
+    считается доля потомков, ставших лучше родителя (строки, которую
+    они заменили), и сглаживается экспоненциально. Вероятности затем
+    распределяются пропорционально этим долям в пределах
+    [min_rate, max_rate]: лучшая пара получает `max_rate`.
+'''
+
+import numpy as np
+
+
+OPERATORS = ('crossover', 'mutation')
+# Вес предыдущей оценки успешности при сглаживании
+MEMORY = 0.8
+
+
+class OperatorAdaptation:
+    '''
+        rates   - текущие вероятности, форма (len(OPERATORS), кол-во специализаций)
+        quality - сглаженная доля удачных применений (nan - ещё не применялся)
+        applied - к каким перестановкам каких строк поколения применялись операторы,
+                форма (len(OPERATORS), кол-во строк, кол-во специализаций)
+        history - `rates` после каждого поколения
+    '''
+    rates:np.ndarray
+    quality:np.ndarray
+    applied:np.ndarray
+    history:list[np.ndarray]
+    min_rate:float
+    max_rate:float
+
+    def __init__(self, p_crossover:float, p_mutation:float, n_specs:int,
+            min_rate:float, max_rate:float):
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.rates = np.clip(np.repeat([[p_crossover], [p_mutation]], n_specs, axis=1),
+                min_rate, max_rate)
+        self.quality = np.full_like(self.rates, np.nan)
+        self.applied = np.zeros((len(OPERATORS), 0, n_specs), dtype=bool)
+        self.history = list()
+
+    def rate(self, operator:str) -> np.ndarray:
+        return self.rates[OPERATORS.index(operator)]
+
+    def start_generation(self, n_rows:int):
+        self.applied = np.zeros((len(OPERATORS), n_rows, self.rates.shape[1]), dtype=bool)
+
+    def mark(self, operator:str, rows:np.ndarray, blocks:np.ndarray):
+        '''
+            Отметить применение `operator` к перестановкам `blocks` строк `rows`.
+        '''
+        self.applied[OPERATORS.index(operator), rows] |= blocks
+
+    def finish_generation(self, improved:np.ndarray):
+        '''
+            Учесть, какие строки поколения стали лучше родителей, и пересчитать `rates`.
+        '''
+        n = self.applied.sum(1)
+        success = (self.applied & improved[None, :, None]).sum(1)
+        seen = n > 0
+        ratio = np.divide(success, n, out=np.zeros_like(self.quality), where=seen)
+        self.quality = np.where(seen & np.isnan(self.quality), ratio,
+                np.where(seen, MEMORY * self.quality + (1 - MEMORY) * ratio, self.quality))
+        known = ~np.isnan(self.quality)
+        best = self.quality[known].max(initial=0)
+        if best > 0:
+            self.rates[known] = self.min_rate + \
+                    (self.max_rate - self.min_rate) * self.quality[known] / best
+        self.history.append(self.rates.copy())
+
+    def rate_history(self) -> dict[str, np.ndarray]:
+        '''
+            История вероятностей каждого оператора: массивы формы
+            (кол-во поколений, кол-во специализаций).
+        '''
+        history = np.array(self.history).reshape(-1, *self.rates.shape)
+        return {operator: history[:, i] for i, operator in enumerate(OPERATORS)}
@@ -14,17 +14,31 @@
     Так же используются элитизм и образование ниш
 '''
 
+import json
 import pickle
-from copy import deepcopy
+from pathlib import Path
+from time import perf_counter
 
 import numpy as np
 
 from json_schemas import AlgorithmParams, TaskConfig, FitnessWeights
+from enums import StopReason
 from task import SchedulingTask
 from global_parameters import POPS_DIR
 from individual import Individual
+from population import Population
+from elite_archive import EliteArchive
 from individual_creator import IndividualCreator
-from evaluation import Evaluator
+from vector_evaluation import VectorizedEvaluator, conflict_genes
+from fitness_cache import FitnessCache
+from tools import genome_key
+from parallel import ParallelEvaluator
+from operators import swap_mutation, order_crossover
+from profiling import Profiler
+from local_search import LocalSearch
+from niching import shared_fitness
+from adaptation import OperatorAdaptation
+from checkpoint import CheckpointWriter, save_checkpoint, load_checkpoint, is_checkpoint
 
 
 class GeneticAlgorithm:
@@ -36,128 +50,439 @@ class GeneticAlgorithm:
 
     weights:FitnessWeights
     params:AlgorithmParams
-    population:np.ndarray[Individual] 
-    hof:np.ndarray
+    population:Population
+    hof:EliteArchive
     ind_creator:IndividualCreator
-    evaluator:Evaluator  
+    evaluator:VectorizedEvaluator
+    fitness_cache:FitnessCache
+    parallel_evaluator:ParallelEvaluator|None
+    local_search:LocalSearch
+    adaptation:OperatorAdaptation|None
+    stop_reason:StopReason|None
+    stall:int
+    checkpoint_writer:CheckpointWriter|None
+    rng:np.random.Generator
+    profiler:Profiler
 
-    def __init__(self, config:TaskConfig):
+    def __init__(self, config:TaskConfig, profile:bool=False, cache_dir:Path|None=None):
         self.params = config.params
         self.weights = config.weights
-        self.task = SchedulingTask(config.data)
-        self.ind_creator = IndividualCreator(self.weights, self.task)
-        self.evaluator = Evaluator(self.weights, self.task)
-        self.hof = np.array([])
+        self.profiler = Profiler(profile)
+        self.rng = np.random.default_rng(self.params.seed)
+        self.task = SchedulingTask(config.data, cache_dir)
+        self.ind_creator = IndividualCreator(self.weights, self.task, self.rng)
+        self.evaluator = VectorizedEvaluator(self.weights, self.task, self.profiler)
+        self.fitness_cache = FitnessCache(self.params.fitness_cache_size)
+        self.parallel_evaluator = None
+        if self.params.workers > 1:
+            self.parallel_evaluator = ParallelEvaluator(self.evaluator, self.params.workers,
+                    self.weights, self.params.population_size)
+        self.hof = EliteArchive(Population.empty(self.task.compiled), self.params.hof_size)
+        self.local_search = LocalSearch(self.weights, self.task, self.profiler)
+        self.adaptation = None
+        if self.params.adaptive_rates:
+            self.adaptation = OperatorAdaptation(self.params.p_crossover, self.params.p_mutation,
+                    len(self.task.compiled.specs), self.params.min_rate, self.params.max_rate)
+        self.stop_reason = None
+        self.stall = 0
+        self.checkpoint_writer = None
 
     def start_algorithm(self, generations:int, verbose_interval:bool=-1, 
-            save_file_name:str=None):
-        self.population = self.evaluation(self.population)
-        self.population.sort()
-        self.hof = deepcopy(self.population[:self.params.hof_size])
-        for gen in range(1, generations+1):
-            num = self.params.population_size - self.params.hof_size
-            selected = self.selection(self.population, num)
-            crossed = self.crossover(selected)
-            muted = self.mutation(crossed)
-            evaluated = self.evaluation(muted)
-            self.population = np.append(evaluated, self.hof, axis=0)
+            save_file_name:str=None, deadline:float=None) -> tuple[Individual, StopReason]:
+        '''
+            Выполнить до `generations` поколений. Алгоритм останавливается
+            раньше по `time_limit`, `stall_generations` и `target_fitness`
+            из параметров, но только между поколениями: популяция и зал славы
+            остаются согласованными, и поиск можно продолжить новым вызовом
+            (счётчик поколений без улучшения при этом сохраняется).
+            args:
+                save_file_name - файл в `POPS_DIR` для контрольных точек, которые
+                        пишутся в фоне раз в `checkpoint_generations` поколений
+                        или `checkpoint_seconds` секунд и в конце вызова
+                deadline - момент остановки по `time.perf_counter` вместо
+                        `time_limit` секунд от начала вызова
+            returns:
+                (лучшая найденная особь, причина остановки)
+        '''
+        profiler = self.profiler
+        if deadline is None:
+            deadline = np.inf
+            if self.params.time_limit is not None:
+                deadline = perf_counter() + self.params.time_limit
+        with profiler.section('evaluation'):
+            self.population = self.evaluation(self.population)
+        with profiler.section('sort'):
             self.population.sort()
-            self.hof = deepcopy(self.population[:self.params.hof_size])
+        with profiler.section('hof_update'):
+            self.hof.update(self.population)
+        best_fitness = self.best_fitness()
+        gen = 0
+        if save_file_name is not None:
+            self.open_checkpoints(POPS_DIR / save_file_name)
+            saved_gen, saved_time = 0, perf_counter()
+        self.stop_reason = self.check_stop(best_fitness, deadline)
+        while self.stop_reason is None and gen < generations:
+            gen += 1
+            num = self.params.population_size - len(self.hof)
+            with profiler.section('sharing'):
+                fitness = self.selection_fitness(self.population)
+            with profiler.section('selection'):
+                # копия строк родителей вместе с их (исходной) приспособленностью;
+                # `dirty` выставляют только скрещивание и мутация
+                selected = self.population[self.selection(self.population, num, fitness)]
+            if self.adaptation is not None:
+                parent_fitness = selected.fitness.copy()
+                self.adaptation.start_generation(len(selected))
+            with profiler.section('crossover'):
+                crossed = self.crossover(selected)
+            with profiler.section('mutation'):
+                muted = self.mutation(crossed)
+            with profiler.section('evaluation'):
+                evaluated = self.evaluation(muted)
+            if self.adaptation is not None:
+                with profiler.section('adaptation'):
+                    self.adaptation.finish_generation(evaluated.fitness < parent_fitness)
+            with profiler.section('sort'):
+                self.population = evaluated.append(self.hof.as_population())
+                self.population.sort()
+            if self.params.local_search_top > 0:
+                with profiler.section('local_search'):
+                    self.improve_best(self.population, self.params.local_search_top)
+            with profiler.section('hof_update'):
+                self.hof.update(self.population)
+            profiler.count('generations')
+            if self.best_fitness() < best_fitness:
+                best_fitness = self.best_fitness()
+                self.stall = 0
+            else:
+                self.stall += 1
             if verbose_interval > 0 and gen%verbose_interval == 0:
-                print([ind.fitness for ind in self.hof])
+                print(self.hof.as_population().fitness.tolist())
                 self.verbose_print(gen, generations)
-            if save_file_name is not None:
-                self.save_population(save_file_name)
+            if save_file_name is not None and self.checkpoint_due(
+                    gen - saved_gen, perf_counter() - saved_time):
+                with profiler.section('save_population'):
+                    self.checkpoint_writer.submit(self.checkpoint_state())
+                saved_gen, saved_time = gen, perf_counter()
+            self.stop_reason = self.check_stop(best_fitness, deadline)
+        if self.stop_reason is None:
+            self.stop_reason = StopReason.GENERATIONS
+        if save_file_name is not None and saved_gen != gen:
+            with profiler.section('save_population'):
+                self.checkpoint_writer.submit(self.checkpoint_state())
         if verbose_interval > 0:
             self.verbose_print(gen, generations)
+            print(f'Stopped: {self.stop_reason.value}')
+        return self.best_individual(), self.stop_reason
+
+    def checkpoint_due(self, generations:int, seconds:float) -> bool:
+        '''
+            Пора ли сохранить контрольную точку, если с прошлой прошло
+            `generations` поколений и `seconds` секунд.
+        '''
+        return (self.params.checkpoint_generations is not None
+                and generations >= self.params.checkpoint_generations) or \
+                (self.params.checkpoint_seconds is not None
+                and seconds >= self.params.checkpoint_seconds)
+
+    def check_stop(self, best_fitness:float, deadline:float) -> StopReason|None:
+        '''
+            Причина досрочной остановки или None, если продолжать.
+        '''
+        if self.params.target_fitness is not None and best_fitness <= self.params.target_fitness:
+            return StopReason.TARGET_FITNESS
+        if self.params.stall_generations is not None and self.stall >= self.params.stall_generations:
+            return StopReason.STALL
+        if perf_counter() >= deadline:
+            return StopReason.TIME_LIMIT
+        return None
+
+    def best_fitness(self) -> float:
+        if len(self.hof):
+            return float(self.hof.fitness.min())
+        return float(np.nanmin(self.population.fitness, initial=np.inf))
+
+    def best_individual(self) -> Individual:
+        '''
+            Лучшая найденная особь: из зала славы, а если он пуст - из популяции.
+        '''
+        if len(self.hof):
+            return self.hof.individual(0)
+        return self.population.individual(int(self.population.best(1)[0]))
     
+    def profile_report(self) -> dict:
+        '''
+            Замеры `profiler` вместе с производными показателями.
+        '''
+        report = self.profiler.report()
+        report['evaluations_per_second'] = self.profiler.rate('evaluations', 'evaluation')
+        report['fitness_cache'] = self.fitness_cache.stats()
+        report['local_search'] = self.local_search.stats()
+        if self.adaptation is not None:
+            report['operator_rates'] = {operator: self.adaptation.rate(operator).tolist()
+                    for operator in ('crossover', 'mutation')}
+        return report
+
+    def close(self):
+        '''
+            Остановить пул процессов оценки и освободить разделяемую память.
+        '''
+        if self.parallel_evaluator is not None:
+            self.parallel_evaluator.close()
+            self.parallel_evaluator = None
+        if self.checkpoint_writer is not None:
+            self.checkpoint_writer.close()
+            self.checkpoint_writer = None
+
+    def open_checkpoints(self, path:Path):
+        '''
+            Писать контрольные точки в фоне в `path`
+            (предыдущий файл дописывается и закрывается).
+        '''
+        if self.checkpoint_writer is not None:
+            if self.checkpoint_writer.path == path:
+                return
+            self.checkpoint_writer.close()
+        self.checkpoint_writer = CheckpointWriter(path)
+
+    def checkpoint_state(self) -> dict[str, np.ndarray]:
+        '''
+            Копия состояния между поколениями, из которого `restore_state`
+            продолжает поиск так же, как без остановки.
+        '''
+        state = {
+            'genomes': self.population.genomes.copy(),
+            'fitness': self.population.fitness.copy(),
+            'rng_state': np.array(json.dumps(self.rng.bit_generator.state)),
+            'stall': np.array(self.stall),
+        }
+        state.update({f'hof_{name}': value for name, value in self.hof.state().items()})
+        if self.adaptation is not None:
+            state['adaptation_rates'] = self.adaptation.rates.copy()
+            state['adaptation_quality'] = self.adaptation.quality.copy()
+        return state
+
+    def restore_state(self, state:dict[str, np.ndarray]):
+        if state['genomes'].shape[1] != self.task.compiled.n_genes:
+            raise ValueError(f'Checkpoint genomes have {state["genomes"].shape[1]} genes, '
+                    f'expected {self.task.compiled.n_genes}')
+        self.population = Population.from_genomes(self.task.compiled,
+                state['genomes'].astype(self.task.compiled.gene_dtype))
+        self.population.fitness = state['fitness'].copy()
+        self.population.dirty = np.isnan(self.population.fitness)
+        self.hof.restore({name[len('hof_'):]: value for name, value in state.items()
+                if name.startswith('hof_')})
+        self.stall = int(state['stall'])
+        if self.adaptation is not None and 'adaptation_rates' in state:
+            self.adaptation.rates = state['adaptation_rates'].copy()
+            self.adaptation.quality = state['adaptation_quality'].copy()
+        self.rng.bit_generator.state = json.loads(str(state['rng_state']))
+
     def save_population(self, save_file_name:str):
-        with open(POPS_DIR / save_file_name, 'wb+') as f:
-            pickle.dump(self.population, f)
+        save_checkpoint(POPS_DIR / save_file_name, self.checkpoint_state())
 
     def load_population(self, load_file_name:str):
-        with open(POPS_DIR / load_file_name, 'rb') as f:
+        '''
+            Загрузить контрольную точку (или популяцию, сохранённую
+            через pickle в прежнем формате) и дополнить популяцию
+            до `population_size`.
+        '''
+        path = POPS_DIR / load_file_name
+        if is_checkpoint(path):
+            self.restore_state(load_checkpoint(path))
+            rng_state = self.rng.bit_generator.state
+            self.population = self.extend_population(
+                    self.params.population_size, self.population)
+            # дополнение популяции не должно сдвигать генератор продолженного поиска
+            self.rng.bit_generator.state = rng_state
+            return
+        with open(path, 'rb') as f:
             self.population = pickle.load(f)
+        if not isinstance(self.population, Population):
+            # сохранено до перехода на матрицу геномов: массив `Individual`
+            self.population = Population.from_individuals(self.task.compiled, self.population)
         self.population = self.extend_population(
                 self.params.population_size, self.population)
     
     def verbose_print(self, gen:int, total:int):
         print(f'\n===Generation {gen}/{total}===')
-        self.evaluator.print_errors(self.hof[0])
+        self.evaluator.print_errors(self.hof.individual(0))
         print('='*20)
 
-    def init_population(self):
-        self.population = self.extend_population(self.params.population_size)
+    def init_population(self, verbose:bool=False):
+        self.population = self.extend_population(self.params.population_size, verbose=verbose)
 
-    def extend_population(self, size:int, init_pop:np.ndarray|list=None) ->np.ndarray[Individual]:
+    def extend_population(self, size:int, init_pop:Population=None,
+            verbose:bool=False) -> Population:
+        '''
+            Дополнить `init_pop` до `size` особей жадными (доля `proportion_by_algorithm`)
+            и случайными особями. При `workers` > 1 жадные особи строятся в пуле
+            процессов, каждая со своим зерном из `SeedSequence`.
+        '''
         if init_pop is None:
-            init_pop = list()
-        init_pop = list(init_pop)
+            init_pop = Population.empty(self.task.compiled)
         size -= len(init_pop)
         algorithm_size = int(size * self.params.proportion_by_algorithm)
         random_size = size - algorithm_size
-        return np.array(init_pop + 
-                [self.ind_creator.create() for _ in range(algorithm_size)] + 
-                [self.ind_creator.create_randomly() for _ in range(random_size)])
+        progress = self.__print_progress if verbose else None
+        with self.profiler.section('init_population'):
+            if self.parallel_evaluator is not None:
+                seeds = np.random.SeedSequence(int(self.rng.integers(2**63))).spawn(algorithm_size)
+                created = Population.from_genomes(self.task.compiled,
+                        self.parallel_evaluator.create_genomes(seeds, progress))
+            else:
+                inds = list()
+                for i in range(algorithm_size):
+                    inds.append(self.ind_creator.create())
+                    if progress is not None:
+                        progress(i + 1, algorithm_size)
+                created = Population.from_individuals(self.task.compiled, inds)
+            created = created.append(Population.from_individuals(self.task.compiled,
+                    [self.ind_creator.create_randomly() for _ in range(random_size)]))
+        return init_pop.append(created)
+
+    def __print_progress(self, done:int, total:int):
+        if done == total or done % max(1, total // 10) == 0:
+            print(f'Created {done}/{total} individuals')
+
+    def emigrants(self, size:int) -> Population:
+        '''
+            Копия `size` лучших особей популяции для отправки на другой остров.
+        '''
+        return self.population[self.population.best(size)]
+
+    def immigrate(self, migrants:Population):
+        '''
+            Заменить худших особей популяции пришедшими с другого острова.
+        '''
+        migrants = migrants[:len(self.population)]
+        worst = self.population.ranking()[len(self.population) - len(migrants):]
+        self.population.genomes[worst] = migrants.genomes
+        self.population.fitness[worst] = migrants.fitness
+        self.population.dirty[worst] = migrants.dirty
+        self.hof.update(migrants)
 
-    def evaluation(self, inds:np.ndarray[Individual]) -> np.ndarray[Individual]:
-        for ind in inds:
-            ind.fitness = self.evaluator.evaluate(ind)
+    def evaluation(self, inds:Population) -> Population:
+        '''
+            Оценить особи с флагом `dirty`, остальные сохраняют
+            приспособленность родителя.
+        '''
+        dirty = np.flatnonzero(inds.dirty)
+        self.profiler.count('clean_offspring', len(inds) - len(dirty))
+        inds.dirty[:] = False
+        # одинаковые геномы (в том числе уже встречавшиеся) оцениваются один раз
+        not_cached = dict()
+        for i in dirty:
+            key = genome_key(inds.genomes[i])
+            fitness = self.fitness_cache.get(key)
+            if fitness is None:
+                not_cached.setdefault(key, list()).append(i)
+            else:
+                inds.fitness[i] = fitness
+        if not not_cached:
+            return inds
+        rows = [same[0] for same in not_cached.values()]
+        values = self.evaluate_genomes(inds.genomes[rows])
+        for (key, same), fitness in zip(not_cached.items(), values):
+            self.fitness_cache.put(key, float(fitness))
+            inds.fitness[same] = fitness
         return inds
 
-    def selection(self, inds:np.ndarray[Individual], size:int) -> np.ndarray[Individual]:
-        return np.array([
-            np.random.choice(inds, self.params.tour_size).min()
-            for _ in range(size)
-        ])
+    def improve_best(self, inds:Population, k:int):
+        '''
+            Улучшить `k` лучших особей локальным поиском (на месте).
+            Обмены применяются прямо к строкам матрицы геномов.
+        '''
+        deadline = np.inf
+        if self.params.local_search_time is not None:
+            deadline = perf_counter() + self.params.local_search_time
+        for i in inds.best(k):
+            if perf_counter() >= deadline:
+                break
+            ind = inds.individual(i)
+            delta = self.local_search.improve(ind, self.rng,
+                    self.params.local_search_moves, deadline)
+            if delta < 0:
+                inds.fitness[i] += delta
+                self.fitness_cache.put(genome_key(inds.genomes[i]), float(inds.fitness[i]))
 
-    def mutation(self, inds:np.ndarray[Individual]) -> np.ndarray[Individual]:
-        for i in range(len(inds)):
-            if np.random.random() < self.params.p_mutation:
-                inds[i] = self.mut(inds[i])
+    def evaluate_genomes(self, genomes:np.ndarray) -> np.ndarray:
+        self.profiler.count('evaluations', len(genomes))
+        if self.parallel_evaluator is not None:
+            return self.parallel_evaluator.evaluate_batch(genomes)
+        fitness, _ = self.evaluator.evaluate_batch(genomes, with_errors=False)
+        return fitness
+
+    def selection_fitness(self, inds:Population) -> np.ndarray:
+        '''
+            Приспособленность для отбора: с разделением по нишам,
+            если задан `distance_threshold`, иначе исходная.
+        '''
+        if self.params.distance_threshold is None:
+            return inds.fitness
+        return shared_fitness(self.task.compiled, inds.genomes, inds.fitness,
+                self.params.distance_threshold, self.params.sharing_extent,
+                self.rng, self.params.niche_sample)
+
+    def selection(self, inds:Population, size:int, fitness:np.ndarray=None) -> np.ndarray[int]:
+        '''
+            Турнирный отбор сразу для всех `size` турниров по `fitness`
+            (по умолчанию `inds.fitness`): возвращает номера победителей в `inds`.
+        '''
+        if fitness is None:
+            fitness = inds.fitness
+        tours = self.rng.integers(0, len(inds), size=(size, self.params.tour_size))
+        winners = np.argmin(fitness[tours], axis=1)
+        return tours[np.arange(size), winners]
+
+    def mutation(self, inds:Population) -> Population:
+        if self.adaptation is None:
+            rows = np.flatnonzero(self.rng.random(len(inds)) < self.params.p_mutation)
+            inds.dirty[swap_mutation(inds.genomes, inds.offsets, rows, self.rng,
+                    hot=self.hot_genes(inds, rows))] = True
+            return inds
+        # вероятность своя для каждой специализации
+        blocks = self.rng.random((len(inds), len(inds.specs))) < self.adaptation.rate('mutation')
+        rows = np.flatnonzero(blocks.any(1))
+        self.adaptation.mark('mutation', rows, blocks[rows])
+        inds.dirty[swap_mutation(inds.genomes, inds.offsets, rows, self.rng,
+                blocks=blocks[rows], hot=self.hot_genes(inds, rows))] = True
         return inds
 
-    def mut(self, ind:Individual) -> Individual:
-        return Individual({spec: self.__mut(ind[spec]) for spec in ind})
-    
-    def __mut(self, arr:np.ndarray[int]) -> np.ndarray[int]:
-        for i in range(len(arr)):
-            if np.random.rand() < 10/len(arr):
-                j = np.random.randint(0, len(arr))
-                arr[i], arr[j] = arr[j], arr[i]
-        return arr
+    def hot_genes(self, inds:Population, rows:np.ndarray) -> np.ndarray|None:
+        '''
+            Гены с нарушениями (см. `conflict_genes`) для доли `targeted_mutation`
+            строк `rows`; у остальных строк мутация остаётся случайной.
+        '''
+        if self.params.targeted_mutation <= 0:
+            return None
+        hot = np.zeros((len(rows), inds.genomes.shape[1]), dtype=bool)
+        guided = self.rng.random(len(rows)) < self.params.targeted_mutation
+        if guided.any():
+            hot[guided] = conflict_genes(self.task.compiled, inds.genomes[rows[guided]])
+        return hot
     
-    def crossover(self, inds:np.ndarray[Individual]) -> np.ndarray[Individual]:
-        for i, j in np.random.randint(0, len(inds), size=(len(inds), 2)):
-            if np.random.rand() < self.params.p_crossover:
-                inds[i], inds[j] = self.cross(inds[i], inds[j])
+    def crossover(self, inds:Population) -> Population:
+        '''
+            Два раунда: особи разбиваются на непересекающиеся пары, каждая пара
+            скрещивается с `p_crossover`. Всего пар столько же, сколько особей,
+            как при выборе N случайных пар, поэтому среднее число скрещиваний
+            за поколение равно N * `p_crossover`.
+        '''
+        for _ in range(2):
+            self.__crossover_round(inds)
         return inds
 
-    def cross(self, ind1:Individual, ind2:Individual) -> \
-            tuple[Individual, Individual]:
-        ret1, ret2 = dict(), dict()
-        for spec in ind1:
-            ret1[spec], ret2[spec] = self.__cross(ind1[spec], ind2[spec])
-        return Individual(ret1), Individual(ret2)
-
-    def __cross(self, arr1:np.ndarray[int], arr2:np.ndarray[int]) ->\
-            tuple[np.ndarray[int], np.ndarray[int]]:
-        ret1, ret2 = arr1.copy(), arr2.copy()
-        n = len(arr1)
-        if n <= 0:
-            return ret1, ret2
-        l, r = np.random.randint(n, size=2)
-        if l > r:
-            l, r = r, l
-        k1 = k2 = r
-        ret1[l:r], ret2[l:r] = arr2[l:r], arr1[l:r]
-        pocket1 = set(ret1[l:r])
-        pocket2 = set(ret2[l:r])
-        for i in range(r, n + r):
-            if arr1[i%n] not in pocket1:
-                ret1[k1%n] = arr1[i%n]
-                k1 += 1
-            if arr2[i%n] not in pocket2:
-                ret2[k2%n] = arr2[i%n]
-                k2 += 1
-        return ret1, ret2
+    def __crossover_round(self, inds:Population):
+        pairs = self.rng.permutation(len(inds))[:len(inds)//2*2].reshape(-1, 2)
+        if self.adaptation is None:
+            pairs = pairs[self.rng.random(len(pairs)) < self.params.p_crossover]
+            inds.dirty[order_crossover(inds.genomes, inds.offsets, pairs, self.rng)] = True
+            return
+        # вероятность своя для каждой специализации
+        blocks = self.rng.random((len(pairs), len(inds.specs))) < self.adaptation.rate('crossover')
+        keep = blocks.any(1)
+        pairs, blocks = pairs[keep], blocks[keep]
+        for rows in pairs.T:
+            self.adaptation.mark('crossover', rows, blocks)
+        inds.dirty[order_crossover(inds.genomes, inds.offsets, pairs, self.rng, blocks)] = True
@@ -0,0 +1,110 @@
+'''
+    Контрольные точки генетического алгоритма.
+    --------
+
+    Контрольная точка - набор массивов numpy (матрица геномов популяции,
+    приспособленности, зал славы, состояние генератора случайных чисел),
+    записанный одним несжатым `.npz`. Файл пишется под временным именем
+    и переименовывается (`os.replace`), поэтому на диске всегда лежит
+    либо прежняя, либо новая полная контрольная точка.
+
+    `CheckpointWriter` пишет файлы в фоновом потоке: алгоритм только
+    копирует массивы и продолжает работу. Если предыдущая запись ещё
+    не закончилась, ожидающий снимок заменяется более новым.
+'''
+
+import os
+import threading
+import zipfile
+from pathlib import Path
+
+import numpy as np
+
+
+def save_checkpoint(path:Path, arrays:dict[str, np.ndarray]):
+    temp = path.with_name(f'{path.name}.tmp{os.getpid()}')
+    with open(temp, 'wb') as file:
+        np.savez(file, **arrays)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp, path)
+
+
+def load_checkpoint(path:Path) -> dict[str, np.ndarray]:
+    with np.load(path, allow_pickle=False) as data:
+        return {name: data[name] for name in data.files}
+
+
+def is_checkpoint(path:Path) -> bool:
+    '''
+        Файл - контрольная точка, а не популяция, сохранённая через pickle.
+    '''
+    return zipfile.is_zipfile(path)
+
+
+class CheckpointWriter:
+    '''
+        Фоновая запись контрольных точек в файл `path`.
+        Ошибка записи поднимается при следующем `submit` или `close`.
+    '''
+    path:Path
+    written:int
+
+    def __init__(self, path:Path):
+        self.path = path
+        self.written = 0
+        self.__pending = None
+        self.__busy = False
+        self.__closed = False
+        self.__error = None
+        self.__condition = threading.Condition()
+        self.__thread = threading.Thread(target=self.__run, daemon=True)
+        self.__thread.start()
+
+    def submit(self, arrays:dict[str, np.ndarray]):
+        '''
+            Поставить снимок в очередь на запись. Массивы не должны
+            меняться после вызова (передавайте копии).
+        '''
+        with self.__condition:
+            self.__raise_error()
+            self.__pending = arrays
+            self.__condition.notify()
+
+    def flush(self):
+        '''
+            Дождаться записи всех поставленных снимков.
+        '''
+        with self.__condition:
+            self.__condition.wait_for(lambda: self.__pending is None and not self.__busy)
+            self.__raise_error()
+
+    def close(self):
+        self.flush()
+        with self.__condition:
+            self.__closed = True
+            self.__condition.notify()
+        self.__thread.join()
+
+    def __raise_error(self):
+        if self.__error is not None:
+            error, self.__error = self.__error, None
+            raise error
+
+    def __run(self):
+        while True:
+            with self.__condition:
+                self.__condition.wait_for(lambda: self.__pending is not None or self.__closed)
+                if self.__pending is None:
+                    return
+                arrays, self.__pending = self.__pending, None
+                self.__busy = True
+            try:
+                save_checkpoint(self.path, arrays)
+                self.written += 1
+            except Exception as error:
+                self.__error = error
+            finally:
+                with self.__condition:
+                    self.__busy = False
+                    self.__condition.notify_all()
@@ -0,0 +1,289 @@
+'''
+    Представление задачи составления расписания в виде плоских массивов.
+    --------
+
+    `SchedulingTask` хранит занятия, аудитории и слоты в виде python-объектов,
+    что удобно для построения расписания, но медленно для подсчёта ошибок.
+    `CompiledTask` переводит те же данные в целочисленные массивы numpy:
+        - занятия (свободные, затем фиксированные) нумеруются подряд
+          и описываются преподавателем, суммарным размером групп
+          и парами (занятие, группа);
+        - слоты всех специализаций склеиваются в один геном, у каждого
+          столбца есть аудитория, время и специализация;
+        - предпочтения заранее раскладываются в таблицы ошибок
+          (занятие, аудитория) и (занятие, время).
+'''
+
+import numpy as np
+
+from enums import ClassroomFeature, ClassroomSpecialization
+from global_parameters import DAYS_PER_WEEK, CLASSES_PER_DAY as CPD
+
+
+# Ошибки, зависящие только от занятия и аудитории (порядок столбцов `class_room_errors`)
+ROOM_TERMS = (
+        't_pref_classroom',
+        't_pref_classroom_feature',
+        'sc_pref_classroom',
+        'sc_pref_classroom_feature',
+)
+# Ошибки, зависящие только от занятия и времени (порядок столбцов `class_time_errors`)
+TIME_TERMS = (
+        'g_unavailable_time',
+        't_pref_time',
+        'sc_pref_time',
+)
+STATIC_TERMS = ROOM_TERMS + TIME_TERMS
+
+FEATURE_BITS = {feature: 1 << i for i, feature in enumerate(ClassroomFeature)}
+# Количество единичных битов для каждой маски особенностей
+FEATURE_POPCOUNT = np.array([bin(mask).count('1')
+        for mask in range(1 << len(FEATURE_BITS))], dtype=np.uint8)
+
+
+def features_to_mask(features) -> int:
+    mask = 0
+    for feature in features:
+        mask |= FEATURE_BITS[feature]
+    return mask
+
+
+class CompiledTask:
+    '''
+        Задача составления расписания в виде массивов.
+
+        Геном особи - это склеенные по порядку `specs` перестановки
+        из `Individual`. Значение гена в столбце `col` - номер занятия
+        внутри специализации столбца; если он не меньше `col_n_classes[col]`,
+        слот пустой.
+    '''
+    specs:list[ClassroomSpecialization]
+    spec_col_offset:np.ndarray
+    spec_n_slots:np.ndarray
+    spec_class_offset:np.ndarray
+    spec_n_classes:np.ndarray
+
+    n_days:int
+    n_week_times:int
+    n_groups:int
+
+    slot_room:np.ndarray
+    slot_time:np.ndarray
+    col_n_classes:np.ndarray
+    col_class_offset:np.ndarray
+
+    class_teacher:np.ndarray
+    class_size:np.ndarray
+    pair_class:np.ndarray
+    pair_group:np.ndarray
+
+    fixed_class:np.ndarray
+    fixed_room:np.ndarray
+    fixed_time:np.ndarray
+
+    room_capacity:np.ndarray
+    room_default:np.ndarray
+    teacher_no_windows:np.ndarray
+
+    class_room_errors:np.ndarray
+    class_time_errors:np.ndarray
+
+    def __init__(self, task):
+        room_ids = list(task.classrooms)
+        room_index = {cl_id: i for i, cl_id in enumerate(room_ids)}
+        teacher_ids = list(task.teachers)
+        teacher_index = {t_id: i for i, t_id in enumerate(teacher_ids)}
+        group_ids = list(task.groups)
+        group_index = {g_id: i for i, g_id in enumerate(group_ids)}
+
+        self.specs = list(task.spec_to_n)
+        classes = [sc for spec in self.specs for sc in task.classes[spec]]
+        fixed = [(sc, room_index[cl_id], time)
+                for cl_id, times in task.fixed.items()
+                for time, fixed_classes in times.items()
+                for sc in fixed_classes]
+        self.fixed_class = np.arange(len(classes), len(classes) + len(fixed), dtype=np.int64)
+        self.fixed_room = np.array([room for _, room, _ in fixed], dtype=np.int64)
+        self.fixed_time = np.array([time for _, _, time in fixed], dtype=np.int64)
+        classes += [sc for sc, _, _ in fixed]
+
+        self.spec_n_slots = np.array([task.spec_to_n[spec] for spec in self.specs], dtype=np.int64)
+        self.spec_col_offset = np.concatenate(([0], np.cumsum(self.spec_n_slots)[:-1])).astype(np.int64)
+        self.spec_n_classes = np.array([len(task.classes[spec]) for spec in self.specs], dtype=np.int64)
+        self.spec_class_offset = np.concatenate(([0], np.cumsum(self.spec_n_classes)[:-1])).astype(np.int64)
+
+        self.slot_room = np.concatenate([task.slot_room[spec] for spec in self.specs]
+                + [np.empty(0, dtype=np.int64)])
+        self.slot_time = np.concatenate([task.slot_time[spec] for spec in self.specs]
+                + [np.empty(0, dtype=np.int64)])
+        self.col_n_classes = np.repeat(self.spec_n_classes, self.spec_n_slots)
+        self.col_class_offset = np.repeat(self.spec_class_offset, self.spec_n_slots)
+
+        max_time = max([*self.slot_time, *self.fixed_time,
+                *(t for g in task.groups.values() for t in g.available_times)], default=0)
+        # max_time - numpy-число, если взято из массивов, а meta пишется в json
+        self.n_days = int(max(DAYS_PER_WEEK, max_time // CPD + 1))
+        self.n_week_times = self.n_days * CPD
+
+        self.class_teacher = np.array([teacher_index[sc.teacher.id] for sc in classes], dtype=np.int64)
+        self.class_size = np.array([sum(g.size for g in sc.groups) for sc in classes], dtype=np.int64)
+        pairs = [(i, group_index[g.id]) for i, sc in enumerate(classes) for g in sc.groups]
+        self.pair_class = np.array([c for c, _ in pairs], dtype=np.int64)
+        self.pair_group = np.array([g for _, g in pairs], dtype=np.int64)
+
+        rooms = [task.classrooms[cl_id] for cl_id in room_ids]
+        teachers = [task.teachers[t_id] for t_id in teacher_ids]
+        groups = [task.groups[g_id] for g_id in group_ids]
+        self.n_groups = len(groups)
+        self.room_capacity = np.array([cl.capacity for cl in rooms], dtype=np.int64)
+        self.room_default = np.array([cl.specialization is ClassroomSpecialization.DEFAULT
+                for cl in rooms], dtype=bool)
+        self.teacher_no_windows = np.array([not t.windows_allowed for t in teachers], dtype=bool)
+
+        room_features = np.array([features_to_mask(cl.features) for cl in rooms], dtype=np.int64)
+        teacher_room = self.__pref_rooms([t.preferences for t in teachers], room_index, len(rooms))
+        teacher_feature = self.__missing_features([t.preferences for t in teachers], room_features)
+        sc_room = self.__pref_rooms([sc.preferences for sc in classes], room_index, len(rooms))
+        sc_feature = self.__missing_features([sc.preferences for sc in classes], room_features)
+        self.class_room_errors = np.stack((
+                teacher_room[self.class_teacher],
+                teacher_feature[self.class_teacher],
+                sc_room,
+                sc_feature), axis=-1).astype(np.uint8)
+
+        group_unavailable = self.__pref_times([g.available_times for g in groups], always=True)
+        teacher_time = self.__pref_times([t.preferences.times for t in teachers])
+        sc_time = self.__pref_times([sc.preferences.times for sc in classes])
+        unavailable = np.zeros((len(classes), self.n_week_times), dtype=np.int16)
+        np.add.at(unavailable, self.pair_class, group_unavailable[self.pair_group])
+        self.class_time_errors = np.stack((
+                unavailable,
+                teacher_time[self.class_teacher],
+                sc_time), axis=-1).astype(np.int16)
+
+    def arrays(self) -> dict[str, np.ndarray]:
+        '''
+            Все массивы задачи по именам атрибутов.
+        '''
+        return {name: value for name, value in vars(self).items()
+                if isinstance(value, np.ndarray)}
+
+    def meta(self) -> dict:
+        '''
+            Всё, кроме массивов (специализации и размеры).
+        '''
+        return {name: value for name, value in vars(self).items()
+                if not isinstance(value, np.ndarray)}
+
+    @classmethod
+    def from_arrays(cls, arrays:dict[str, np.ndarray], meta:dict) -> 'CompiledTask':
+        '''
+            Собрать задачу из результатов `arrays` и `meta`, не копируя массивы
+            (например, поверх разделяемой памяти).
+        '''
+        compiled = cls.__new__(cls)
+        compiled.__dict__.update(meta)
+        compiled.__dict__.update(arrays)
+        return compiled
+
+    @property
+    def n_classes(self) -> int:
+        return len(self.class_teacher)
+
+    @property
+    def n_genes(self) -> int:
+        return len(self.slot_room)
+
+    @property
+    def gene_dtype(self) -> type:
+        '''
+            Наименьший целый тип, в который помещаются номера слотов.
+        '''
+        max_gene = int(self.spec_n_slots.max(initial=0))
+        return np.int16 if max_gene <= np.iinfo(np.int16).max else np.int32
+
+    @property
+    def n_rooms(self) -> int:
+        return len(self.room_capacity)
+
+    @property
+    def n_teachers(self) -> int:
+        return len(self.teacher_no_windows)
+
+    def __pref_rooms(self, preferences:list, room_index:dict[int, int], n_rooms:int) -> np.ndarray:
+        result = np.zeros((len(preferences), n_rooms), dtype=bool)
+        for i, pref in enumerate(preferences):
+            if pref.classrooms:
+                result[i] = True
+                result[i, [room_index[cl_id] for cl_id in pref.classrooms
+                        if cl_id in room_index]] = False
+        return result
+
+    def __missing_features(self, preferences:list, room_features:np.ndarray) -> np.ndarray:
+        pref_features = np.array([features_to_mask(pref.classroom_features)
+                for pref in preferences], dtype=np.int64)
+        return FEATURE_POPCOUNT[pref_features[:, None] & ~room_features[None, :]
+                & (len(FEATURE_POPCOUNT) - 1)]
+
+    def __pref_times(self, times_list:list[set[int]], always:bool=False) -> np.ndarray:
+        '''
+            Матрица "время не из множества". Пустое множество считается
+            отсутствием предпочтений, если не задан `always`.
+        '''
+        result = np.zeros((len(times_list), self.n_week_times), dtype=bool)
+        for i, times in enumerate(times_list):
+            if times or always:
+                result[i] = True
+                result[i, [t for t in times if 0 <= t < self.n_week_times]] = False
+        return result
+
+    def static_cost_flat(self, weights) -> np.ndarray:
+        '''
+            Взвешенная сумма ошибок из `STATIC_TERMS` для каждой пары
+            (занятие, слот): матрицы формы (кол-во занятий, кол-во слотов)
+            всех специализаций из `specs` подряд в одном массиве
+            и нулевой элемент в конце (стоимость пустого слота).
+        '''
+        room_weights = np.array([getattr(weights, name) for name in ROOM_TERMS])
+        time_weights = np.array([getattr(weights, name) for name in TIME_TERMS])
+        flat = np.zeros(int((self.spec_n_classes * self.spec_n_slots).sum()) + 1)
+        for offset, n, col, n_slots, cost in zip(self.spec_class_offset, self.spec_n_classes,
+                self.spec_col_offset, self.spec_n_slots, self.static_cost_views(flat)):
+            room_cost = self.class_room_errors[offset:offset+n] @ room_weights
+            time_cost = self.class_time_errors[offset:offset+n] @ time_weights
+            cost[...] = room_cost[:, self.slot_room[col:col+n_slots]] + \
+                    time_cost[:, self.slot_time[col:col+n_slots]]
+        return flat
+
+    def static_cost_views(self, flat:np.ndarray) -> list[np.ndarray]:
+        '''
+            Матрицы специализаций - представления результата `static_cost_flat`.
+        '''
+        sizes = self.spec_n_classes * self.spec_n_slots
+        bases = np.cumsum(sizes) - sizes
+        return [flat[base:base+size].reshape(n, n_slots) for base, size, n, n_slots
+                in zip(bases, sizes, self.spec_n_classes, self.spec_n_slots)]
+
+    def static_cost(self, weights) -> list[np.ndarray]:
+        '''
+            Матрицы `static_cost_flat` по специализациям из `specs`.
+        '''
+        return self.static_cost_views(self.static_cost_flat(weights))
+
+    def fixed_static_cost(self, weights) -> float:
+        '''
+            Взвешенная сумма ошибок из `STATIC_TERMS` фиксированных занятий.
+        '''
+        room_weights = np.array([getattr(weights, name) for name in ROOM_TERMS])
+        time_weights = np.array([getattr(weights, name) for name in TIME_TERMS])
+        room_cost = self.class_room_errors[self.fixed_class, self.fixed_room] @ room_weights
+        time_cost = self.class_time_errors[self.fixed_class, self.fixed_time] @ time_weights
+        return float(room_cost.sum() + time_cost.sum())
+
+    def individual_to_genome(self, ind) -> np.ndarray:
+        return np.concatenate([np.asarray(ind[spec], dtype=np.int64) for spec in self.specs])
+
+    def individuals_to_genomes(self, inds) -> np.ndarray:
+        if len(inds) == 0:
+            return np.empty((0, self.n_genes), dtype=np.int64)
+        return np.stack([self.individual_to_genome(ind) for ind in inds])
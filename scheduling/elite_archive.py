@@ -0,0 +1,113 @@
+import numpy as np
+
+from individual import Individual
+from population import Population
+from tools import genome_key
+
+
+class EliteArchive:
+    '''
+        Зал славы: до `size` лучших особей с различными геномами.
+
+        Геномы лежат в матрице фиксированного размера и индексируются
+        по `tools.genome_key`, поэтому копия уже имеющейся особи
+        не добавляется, а оставшиеся в зале особи не копируются заново.
+    '''
+    size:int
+    genomes:np.ndarray
+    fitness:np.ndarray
+    keys:list[bytes|None]
+
+    def __init__(self, population:Population, size:int):
+        self.size = size
+        self.specs = population.specs
+        self.offsets = population.offsets
+        self.genomes = np.zeros((size, population.genomes.shape[1]),
+                dtype=population.genomes.dtype)
+        self.fitness = np.full(size, np.inf)
+        self.keys = [None] * size
+        self.__slots = dict()
+        self.__worst = 0
+
+    def __len__(self) -> int:
+        return len(self.__slots)
+
+    def __contains__(self, key:bytes) -> bool:
+        return key in self.__slots
+
+    def update(self, population:Population) -> int:
+        '''
+            Добавить лучшие особи `population`, вытесняя худшие из зала.
+            Возвращает количество добавленных особей.
+        '''
+        if self.size <= 0:
+            return 0
+        # без отсечения по `size`: копии особей зала не должны вытеснять
+        # из рассмотрения новые геномы, перебор прерывается по худшему в зале
+        better = np.flatnonzero(population.fitness < self.fitness[self.__worst])
+        better = better[np.argsort(population.fitness[better], kind='stable')]
+        inserted = 0
+        for i in better:
+            if population.fitness[i] >= self.fitness[self.__worst]:
+                break
+            key = genome_key(population.genomes[i])
+            if key in self.__slots:
+                continue
+            self.__insert(key, population.genomes[i], population.fitness[i])
+            inserted += 1
+        return inserted
+
+    def __insert(self, key:bytes, genome:np.ndarray, fitness:float):
+        slot = self.__worst
+        if self.keys[slot] is not None:
+            del self.__slots[self.keys[slot]]
+        self.keys[slot] = key
+        self.__slots[key] = slot
+        self.genomes[slot] = genome
+        self.fitness[slot] = fitness
+        # худший слот пересчитывается только после замены, а не на каждую проверку
+        self.__worst = int(np.argmax(self.fitness))
+
+    def ranking(self) -> np.ndarray:
+        '''
+            Номера занятых слотов по возрастанию приспособленности.
+        '''
+        order = np.argsort(self.fitness, kind='stable')
+        return order[:len(self)]
+
+    def individual(self, i:int) -> Individual:
+        '''
+            `i`-я по качеству особь зала славы.
+        '''
+        return self.as_population().individual(i)
+
+    def as_population(self) -> Population:
+        order = self.ranking()
+        return Population(self.genomes[order], self.specs, self.offsets, self.fitness[order])
+
+    def state(self) -> dict[str, np.ndarray]:
+        '''
+            Копия слотов зала (для контрольных точек).
+        '''
+        return {
+            'genomes': self.genomes.copy(),
+            'fitness': self.fitness.copy(),
+            'used': np.array([key is not None for key in self.keys], dtype=bool),
+        }
+
+    def restore(self, state:dict[str, np.ndarray]):
+        '''
+            Восстановить зал из результата `state`. Если размер зала
+            изменился, особи из `state` просто добавляются через `update`.
+        '''
+        used = state['used']
+        if len(used) != self.size:
+            self.update(Population(state['genomes'][used], self.specs, self.offsets,
+                    state['fitness'][used]))
+            return
+        self.genomes[...] = state['genomes']
+        self.fitness[...] = state['fitness']
+        self.keys = [genome_key(genome) if in_use else None
+                for genome, in_use in zip(self.genomes, used)]
+        self.__slots = {key: slot for slot, key in enumerate(self.keys) if key is not None}
+        self.__worst = int(np.argmax(self.fitness)) if self.size > 0 else 0
@@ -32,3 +32,29 @@ class ClassroomSpecialization(Enum):
     DEFAULT = 'Default'
     COMPUTERS = 'Computers'
     SPORTSROOM = 'Sportsroom'
+
+
+class MigrationTopology(Enum):
+    '''
+        Куда отправляются лучшие особи острова при миграции
+            RING     - на следующий по кругу остров
+            COMPLETE - на все остальные острова
+    '''
+    RING = 'Ring'
+    COMPLETE = 'Complete'
+
+
+class StopReason(Enum):
+    '''
+        Причина остановки генетического алгоритма
+            GENERATIONS    - выполнено заданное количество поколений
+            TIME_LIMIT     - исчерпано время
+            STALL          - зал славы долго не улучшался
+            TARGET_FITNESS - достигнута целевая приспособленность
+            INTERRUPTED    - прерван пользователем (Ctrl-C)
+    '''
+    GENERATIONS = 'Generations'
+    TIME_LIMIT = 'Time limit'
+    STALL = 'Stall'
+    TARGET_FITNESS = 'Target fitness'
+    INTERRUPTED = 'Interrupted'
@@ -1,4 +1,4 @@
-from collections import defaultdict
+from collections import Counter
 from abc import ABC, abstractmethod
 
 from json_schemas import Classroom
@@ -7,9 +7,44 @@ from task import StudyClass
 from enums import ClassroomSpecialization
 from global_parameters import MAX_CLASSES_PER_DAY as MCPD
 
+
+class SnapshotDict(dict):
+    '''
+        Словарь поверх неизменяемого снимка `base`: значение по ключу
+        копируется из снимка при первом обращении (или создаётся `factory`),
+        поэтому возврат к снимку не требует копирования всего состояния.
+    '''
+    def __init__(self, factory, base:dict|None=None):
+        super().__init__()
+        self.factory = factory
+        self.base = base
+
+    def __missing__(self, key):
+        if self.base is not None and key in self.base:
+            value = self.factory(self.base[key])
+        else:
+            value = self.factory()
+        self[key] = value
+        return value
+
+
+def snapshot_schedule(depth:int, leaf:type):
+    '''
+        Фабрика вложенных `SnapshotDict` глубины `depth` с листьями типа `leaf`.
+        Вызов с аргументом создаёт копию (для листьев) или представление
+        поверх снимка (для словарей).
+    '''
+    if depth == 0:
+        return leaf
+    def factory(base:dict|None=None) -> SnapshotDict:
+        return SnapshotDict(snapshot_schedule(depth - 1, leaf), base)
+    return factory
+
+
 class ErrorsCounter(ABC):
     def __init__(self):
         super().__init__()
+        self.base_count = 0
         self.cur_count = 0
     
     @abstractmethod
@@ -23,81 +58,128 @@ class ErrorsCounter(ABC):
     def temp_count(self, week_time:int, study_class:StudyClass, classroom:Classroom) -> int:
         pass
 
+    # Убрать занятие, ранее посчитанное методом `count`
+    @abstractmethod
+    def uncount(self, week_time:int, study_class:StudyClass, classroom:Classroom):
+        pass
+
     def get_count(self) -> int:
         return self.cur_count
     
+    # Вернуться к состоянию последнего снимка (по умолчанию - к пустому)
     def reset(self):
-        self.cur_count = 0 
-    
+        self.cur_count = self.base_count
+
+    # Запомнить текущее состояние как исходное для `reset`
+    # и вернуть его для передачи другим счётчикам того же типа
+    def snapshot(self) -> dict:
+        self.base_count = self.cur_count
+        return {'base_count': self.base_count}
+
+    def load_snapshot(self, snapshot:dict):
+        self.__dict__.update(snapshot)
+        self.reset()
+
+
+class ScheduleCounter(ErrorsCounter):
+    '''
+        Счётчик, хранящий расписание сущностей во вложенных словарях
+        глубины `depth` с листьями типа `leaf`.
+    '''
+    depth:int
+    leaf:type
 
-class WindowCounter(ErrorsCounter):
     def __init__(self):
         super().__init__()
-        self.schedule = defaultdict(lambda: defaultdict(set))
-    
+        self.base_schedule = None
+        self.schedule = snapshot_schedule(self.depth, self.leaf)()
+
     def reset(self):
         super().reset()
-        del self.schedule
-        self.schedule = defaultdict(lambda: defaultdict(set))
+        self.schedule = snapshot_schedule(self.depth, self.leaf)(self.base_schedule)
+
+    def snapshot(self) -> dict:
+        snapshot = super().snapshot()
+        snapshot['base_schedule'] = self.base_schedule = self.schedule
+        self.reset()
+        return snapshot
+
+
+class WindowCounter(ScheduleCounter):
+    # День хранится как мультимножество номеров пар, чтобы при `uncount`
+    # одного из параллельных занятий пара не пропадала из дня
+    depth = 2
+    leaf = Counter
     
-    def calc_count_in_day(self, day:set[int]) -> int:
+    def calc_count_in_day(self, day:Counter[int]) -> int:
         if not day:
             return 0
         return max(day) - min(day) - len(day) + 1
 
+    def add_to_day(self, day:Counter[int], day_time:int):
+        self.cur_count -= self.calc_count_in_day(day)
+        day[day_time] += 1
+        self.cur_count += self.calc_count_in_day(day)
+
+    def remove_from_day(self, day:Counter[int], day_time:int):
+        self.cur_count -= self.calc_count_in_day(day)
+        day[day_time] -= 1
+        if day[day_time] <= 0:
+            del day[day_time]
+        self.cur_count += self.calc_count_in_day(day)
+
+    def temp_add_to_day(self, day:Counter[int], day_time:int) -> int:
+        if day_time in day:
+            return 0
+        before = self.calc_count_in_day(day)
+        day[day_time] = 1
+        after = self.calc_count_in_day(day)
+        del day[day_time]
+        return after - before
+
 
 class GroupWindow(WindowCounter):    
     def count(self, week_time:int, study_class:StudyClass, classroom:Classroom):
         week_day, day_time = get_wd_and_dt(week_time)
         for group in study_class.groups:
-            day = self.schedule[group.id][week_day]
-            self.cur_count -= self.calc_count_in_day(day)
-            day.add(day_time)
-            self.cur_count += self.calc_count_in_day(day)
+            self.add_to_day(self.schedule[group.id][week_day], day_time)
     
     def temp_count(self, week_time: int, study_class: StudyClass, classroom: Classroom) -> int:
         week_day, day_time = get_wd_and_dt(week_time)
         temp_err_count = self.cur_count
         for group in study_class.groups:
-            day = self.schedule[group.id][week_day]
-            if day_time not in day:
-                temp_err_count -= self.calc_count_in_day(day)
-                day.add(day_time)
-                temp_err_count += self.calc_count_in_day(day)
-                day.remove(day_time)
+            temp_err_count += self.temp_add_to_day(self.schedule[group.id][week_day], day_time)
         return temp_err_count
 
+    def uncount(self, week_time:int, study_class:StudyClass, classroom:Classroom):
+        week_day, day_time = get_wd_and_dt(week_time)
+        for group in study_class.groups:
+            self.remove_from_day(self.schedule[group.id][week_day], day_time)
+
 
 class TeacherWindow(WindowCounter):     
     def count(self, week_time:int, study_class:StudyClass, classroom:Classroom):
         if not study_class.teacher.windows_allowed:
             week_day, day_time = get_wd_and_dt(week_time)
-            day = self.schedule[study_class.teacher.id][week_day]
-            self.cur_count -= self.calc_count_in_day(day)
-            day.add(day_time)
-            self.cur_count += self.calc_count_in_day(day)
+            self.add_to_day(self.schedule[study_class.teacher.id][week_day], day_time)
     
     def temp_count(self, week_time: int, study_class: StudyClass, classroom: Classroom) -> int:
         temp_err_count = self.cur_count
         if not study_class.teacher.windows_allowed:
             week_day, day_time = get_wd_and_dt(week_time)
-            day = self.schedule[study_class.teacher.id][week_day]
-            temp_err_count -= self.calc_count_in_day(day)
-            day.add(day_time)
-            temp_err_count += self.calc_count_in_day(day)
-            day.remove(day_time)
+            temp_err_count += self.temp_add_to_day(
+                    self.schedule[study_class.teacher.id][week_day], day_time)
         return temp_err_count
 
+    def uncount(self, week_time:int, study_class:StudyClass, classroom:Classroom):
+        if not study_class.teacher.windows_allowed:
+            week_day, day_time = get_wd_and_dt(week_time)
+            self.remove_from_day(self.schedule[study_class.teacher.id][week_day], day_time)
 
-class ParallelCounter(ErrorsCounter):
-    def __init__(self):
-        super().__init__()
-        self.schedule = defaultdict(lambda: defaultdict(lambda: defaultdict(int)))   
-    
-    def reset(self):
-        super().reset()
-        del self.schedule
-        self.schedule = defaultdict(lambda: defaultdict(lambda: defaultdict(int)))
+
+class ParallelCounter(ScheduleCounter):
+    depth = 3
+    leaf = int
 
 
 class GroupParallel(ParallelCounter):
@@ -116,6 +198,13 @@ class GroupParallel(ParallelCounter):
                 temp_err_count += 1
         return temp_err_count
 
+    def uncount(self, week_time:int, study_class:StudyClass, classroom:Classroom):
+        week_day, day_time = get_wd_and_dt(week_time)
+        for group in study_class.groups:
+            if self.schedule[group.id][week_day][day_time] > 1:
+                self.cur_count -= 1
+            self.schedule[group.id][week_day][day_time] -= 1
+
 
 class TeacherParallel(ParallelCounter):
     def count(self, week_time:int, study_class:StudyClass, classroom:Classroom):
@@ -128,11 +217,16 @@ class TeacherParallel(ParallelCounter):
         week_day, day_time = get_wd_and_dt(week_time)
         return self.cur_count + int(self.schedule[study_class.teacher.id][week_day][day_time] > 0) 
 
+    def uncount(self, week_time:int, study_class:StudyClass, classroom:Classroom):
+        week_day, day_time = get_wd_and_dt(week_time)
+        if self.schedule[study_class.teacher.id][week_day][day_time] > 1:
+            self.cur_count -= 1
+        self.schedule[study_class.teacher.id][week_day][day_time] -= 1
 
-class ExcessClass(ErrorsCounter):
-    def __init__(self):
-        super().__init__()
-        self.schedule = defaultdict(lambda: defaultdict(int))
+
+class ExcessClass(ScheduleCounter):
+    depth = 2
+    leaf = int
     
     def count(self, week_time:int, study_class:StudyClass, classroom:Classroom):
         week_day, _ = get_wd_and_dt(week_time)
@@ -149,16 +243,17 @@ class ExcessClass(ErrorsCounter):
                 temp_err_count += 1
         return temp_err_count
 
-    def reset(self):
-        super().reset()
-        del self.schedule
-        self.schedule = defaultdict(lambda: defaultdict(int))
+    def uncount(self, week_time:int, study_class:StudyClass, classroom:Classroom):
+        week_day, _ = get_wd_and_dt(week_time)
+        for group in study_class.groups:
+            if self.schedule[group.id][week_day] > MCPD:
+                self.cur_count -= 1
+            self.schedule[group.id][week_day] -= 1
 
 
-class ClassroomOverflow(ErrorsCounter):
-    def __init__(self):
-        super().__init__()
-        self.schedule = defaultdict(lambda: defaultdict(lambda: defaultdict(int)))
+class ClassroomOverflow(ScheduleCounter):
+    depth = 3
+    leaf = int
     
     def count(self, week_time:int, study_class:StudyClass, classroom:Classroom):
         week_day, day_time = get_wd_and_dt(week_time)
@@ -176,10 +271,13 @@ class ClassroomOverflow(ErrorsCounter):
         already_in_room += sum(group.size for group in study_class.groups)
         return temp_err_count + max(0, already_in_room - classroom.capacity)
 
-    def reset(self):
-        super().reset()
-        del self.schedule
-        self.schedule = defaultdict(lambda: defaultdict(lambda: defaultdict(int)))
+    def uncount(self, week_time:int, study_class:StudyClass, classroom:Classroom):
+        week_day, day_time = get_wd_and_dt(week_time)
+        already_in_room = self.schedule[classroom.id][week_day][day_time]
+        self.cur_count -= max(0, already_in_room - classroom.capacity)
+        already_in_room -= sum(group.size for group in study_class.groups)
+        self.cur_count += max(0, already_in_room - classroom.capacity)
+        self.schedule[classroom.id][week_day][day_time] = already_in_room
 
 
 class StandardClassroomOverflow(ClassroomOverflow):
@@ -191,6 +289,10 @@ class StandardClassroomOverflow(ClassroomOverflow):
         if classroom.specialization is ClassroomSpecialization.DEFAULT:
             return super().temp_count(week_time, study_class, classroom)
         return self.cur_count
+
+    def uncount(self, week_time:int, study_class:StudyClass, classroom:Classroom):
+        if classroom.specialization is ClassroomSpecialization.DEFAULT:
+            super().uncount(week_time, study_class, classroom)
     
 
 class SpecialClassroomOverflow(ClassroomOverflow):
@@ -203,6 +305,10 @@ class SpecialClassroomOverflow(ClassroomOverflow):
             return super().temp_count(week_time, study_class, classroom)
         return self.cur_count
 
+    def uncount(self, week_time:int, study_class:StudyClass, classroom:Classroom):
+        if classroom.specialization is not ClassroomSpecialization.DEFAULT:
+            super().uncount(week_time, study_class, classroom)
+
 
 class UnavailableGroupTime(ErrorsCounter):
     def count(self, week_time:int, study_class:StudyClass, classroom:Classroom):
@@ -217,6 +323,11 @@ class UnavailableGroupTime(ErrorsCounter):
                 temp_err_count += 1
         return temp_err_count
 
+    def uncount(self, week_time:int, study_class:StudyClass, classroom:Classroom):
+        for group in study_class.groups:
+            if week_time not in group.available_times:
+                self.cur_count -= 1
+
 
 class TeacherPrefClassroom(ErrorsCounter):
     def count(self, week_time:int, study_class:StudyClass, classroom:Classroom):
@@ -230,6 +341,11 @@ class TeacherPrefClassroom(ErrorsCounter):
             return self.cur_count + 1
         return self.cur_count
 
+    def uncount(self, week_time:int, study_class:StudyClass, classroom:Classroom):
+        if study_class.teacher.preferences.classrooms and \
+                classroom.id not in study_class.teacher.preferences.classrooms:
+            self.cur_count -= 1
+
 
 class TeacherPrefTime(ErrorsCounter):
     def count(self, week_time:int, study_class:StudyClass, classroom:Classroom):
@@ -243,6 +359,11 @@ class TeacherPrefTime(ErrorsCounter):
             return self.cur_count + 1
         return self.cur_count
 
+    def uncount(self, week_time:int, study_class:StudyClass, classroom:Classroom):
+        if study_class.teacher.preferences.times and \
+                week_time not in study_class.teacher.preferences.times:
+            self.cur_count -= 1
+
 
 class TeacherPrefClassroomFeature(ErrorsCounter):
     def count(self, week_time:int, study_class:StudyClass, classroom:Classroom):
@@ -255,6 +376,11 @@ class TeacherPrefClassroomFeature(ErrorsCounter):
             study_class.teacher.preferences.classroom_features - classroom.features
         )
 
+    def uncount(self, week_time:int, study_class:StudyClass, classroom:Classroom):
+        self.cur_count -= len(
+            study_class.teacher.preferences.classroom_features - classroom.features
+        )
+
 
 class SCPrefClassroom(ErrorsCounter):
     def count(self, week_time:int, study_class:StudyClass, classroom:Classroom):
@@ -268,6 +394,11 @@ class SCPrefClassroom(ErrorsCounter):
             return self.cur_count + 1
         return self.cur_count
 
+    def uncount(self, week_time:int, study_class:StudyClass, classroom:Classroom):
+        if study_class.preferences.classrooms and \
+                classroom.id not in study_class.preferences.classrooms:
+            self.cur_count -= 1
+
 
 class SCPrefTime(ErrorsCounter):
     def count(self, week_time:int, study_class:StudyClass, classroom:Classroom):
@@ -281,6 +412,11 @@ class SCPrefTime(ErrorsCounter):
             return self.cur_count + 1
         return self.cur_count
 
+    def uncount(self, week_time:int, study_class:StudyClass, classroom:Classroom):
+        if study_class.preferences.times and \
+                week_time not in study_class.preferences.times:
+            self.cur_count -= 1
+
 
 class SCPrefClassroomFeature(ErrorsCounter):
     def count(self, week_time:int, study_class:StudyClass, classroom:Classroom):
@@ -292,3 +428,8 @@ class SCPrefClassroomFeature(ErrorsCounter):
         return self.cur_count + len(
             study_class.preferences.classroom_features - classroom.features
         )
+
+    def uncount(self, week_time:int, study_class:StudyClass, classroom:Classroom):
+        self.cur_count -= len(
+            study_class.preferences.classroom_features - classroom.features
+        )
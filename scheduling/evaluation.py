@@ -1,9 +1,13 @@
+from time import perf_counter
+from weakref import WeakKeyDictionary
+
 import numpy as np
 
 from individual import Individual
 from task import SchedulingTask, StudyClass
 from enums import ClassroomSpecialization
 from json_schemas import FitnessWeights, Classroom
+from profiling import Profiler, NO_PROFILER
 from error_counters import (
         ErrorsCounter, 
         GroupWindow, 
@@ -42,16 +46,25 @@ WTEC = {
 }
 
 
+# Снимки счётчиков после подсчёта фиксированных занятий, по одному на задачу
+BASELINES:WeakKeyDictionary[SchedulingTask, list[dict]] = WeakKeyDictionary()
+
+
 class Evaluator:
     weights:np.ndarray
     error_counters:list[ErrorsCounter]
     task:SchedulingTask
+    loaded:Individual|None
+    profiler:Profiler
 
-    def __init__(self, weights:FitnessWeights, scheduling_task:SchedulingTask):
+    def __init__(self, weights:FitnessWeights, scheduling_task:SchedulingTask,
+            profiler:Profiler=NO_PROFILER):
+        self.profiler = profiler
         self.weights = np.array(list(map(weights.__getattribute__, WTEC.keys())))
         self.error_counters = [e() for e in WTEC.values()]
         self.task = scheduling_task
-        self.reset_counters()
+        self.loaded = None
+        self.load_baseline()
 
     def evaluate(self, ind:Individual) -> float:
         self.reset_counters()
@@ -68,21 +81,118 @@ class Evaluator:
                 self.count_class(self.task.classes[spec][class_num], classroom, week_time)
 
     def count_class(self, study_class:StudyClass, classroom:Classroom, week_time:int):
+        if self.profiler.enabled:
+            self.__profiled('count', range(len(self.error_counters)), 
+                    study_class, classroom, week_time)
+            return
         for error_counter in self.error_counters:
             error_counter.count(week_time, study_class, classroom)
     
+    def uncount_class(self, study_class:StudyClass, classroom:Classroom, week_time:int):
+        if self.profiler.enabled:
+            self.__profiled('uncount', range(len(self.error_counters)), 
+                    study_class, classroom, week_time)
+            return
+        for error_counter in self.error_counters:
+            error_counter.uncount(week_time, study_class, classroom)
+
+    def load_individual(self, ind:Individual):
+        '''
+            Посчитать особь и оставить её в счётчиках, чтобы затем
+            оценивать изменения через `delta_swap`.
+        '''
+        self.reset_counters()
+        self.count_individual(ind)
+        self.loaded = ind
+
+    def delta_swap(self, ind:Individual, spec:ClassroomSpecialization, 
+            i:int, j:int, commit:bool=False) -> float:
+        '''
+            Изменение приспособленности особи при обмене генов `i` и `j`
+            в перестановке `spec`. Пересчитываются только занятия
+            в двух затронутых слотах, а не вся особь.
+
+            Если `commit`, обмен применяется к особи и остаётся в счётчиках,
+            иначе счётчики возвращаются в исходное состояние.
+        '''
+        return self.__swap(ind, spec, i, j, lambda change: commit)
+
+    def try_swap(self, ind:Individual, spec:ClassroomSpecialization,
+            i:int, j:int) -> float:
+        '''
+            То же, что `delta_swap`, но обмен применяется,
+            только если он уменьшает приспособленность.
+        '''
+        return self.__swap(ind, spec, i, j, lambda change: change < 0)
+
+    def __swap(self, ind:Individual, spec:ClassroomSpecialization,
+            i:int, j:int, keep) -> float:
+        if self.loaded is not ind:
+            self.load_individual(ind)
+        arr = ind[spec]
+        before = self.weight_errors([ec.get_count() for ec in self.error_counters])
+        self.__move(spec, i, arr[i], j)
+        self.__move(spec, j, arr[j], i)
+        after = self.weight_errors([ec.get_count() for ec in self.error_counters])
+        if keep(after - before):
+            arr[i], arr[j] = arr[j], arr[i]
+        else:
+            self.__move(spec, j, arr[i], i)
+            self.__move(spec, i, arr[j], j)
+        return after - before
+
+    def __move(self, spec:ClassroomSpecialization, src:int, class_num:int, dst:int):
+        '''
+            Перенести занятие `class_num` из слота `src` в слот `dst` (в счётчиках).
+        '''
+        if class_num >= len(self.task.classes[spec]):
+            return
+        study_class = self.task.classes[spec][class_num]
+        self.uncount_class(study_class, *self.task.get_cl_wt(spec, src))
+        self.count_class(study_class, *self.task.get_cl_wt(spec, dst))
+
     def count_class_without_saving(self, study_class:StudyClass, 
             classroom:Classroom, week_time:int) -> float:
+        if self.profiler.enabled:
+            return self.weight_errors(self.__profiled('temp_count', 
+                    range(len(self.error_counters)), study_class, classroom, week_time))
         return self.weight_errors([
             ec.temp_count(week_time, study_class, classroom) 
             for ec in self.error_counters])
+
+    def __profiled(self, method:str, counters:list[int], study_class:StudyClass,
+            classroom:Classroom, week_time:int) -> list:
+        '''
+            Вызвать `method` у счётчиков с номерами `counters`,
+            замеряя время каждого в разделе `counter.<имя веса>`.
+        '''
+        names = list(WTEC)
+        result = list()
+        for i in counters:
+            start = perf_counter()
+            result.append(getattr(self.error_counters[i], method)(week_time, study_class, classroom))
+            self.profiler.add(f'counter.{names[i]}', perf_counter() - start)
+        return result
     
     def weight_errors(self, errors:list[int]) -> float:
         return float(np.dot(self.weights, np.array(errors)))
     
     def reset_counters(self):
+        self.loaded = None
         for error_counter in self.error_counters:
             error_counter.reset()
+
+    def load_baseline(self):
+        '''
+            Привести счётчики к состоянию после подсчёта фиксированных занятий.
+            Это состояние считается один раз на задачу, после чего
+            `reset_counters` возвращается к нему без повторного подсчёта.
+        '''
+        self.loaded = None
+        if self.task in BASELINES:
+            for error_counter, snapshot in zip(self.error_counters, BASELINES[self.task]):
+                error_counter.load_snapshot(snapshot)
+            return
         for classroom_id, times in self.task.fixed.items():
             for time, classes in times.items():
                 for study_class in classes:
@@ -90,6 +200,7 @@ class Evaluator:
                             study_class, 
                             self.task.classrooms[classroom_id], 
                             time)
+        BASELINES[self.task] = [ec.snapshot() for ec in self.error_counters]
         
     def get_errors(self) -> dict[str, int]:
         return {err_name: ec.get_count() for err_name, ec in 
@@ -0,0 +1,53 @@
+from collections import OrderedDict
+
+
+class FitnessCache:
+    '''
+        Ограниченный по размеру кэш приспособленности особей
+        по ключу генома (см. `tools.genome_key`).
+        При переполнении вытесняется дольше всех не использованная запись.
+    '''
+    max_size:int
+    hits:int
+    misses:int
+
+    def __init__(self, max_size:int):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.__data = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.__data)
+
+    def get(self, key:bytes) -> float|None:
+        fitness = self.__data.get(key)
+        if fitness is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.__data.move_to_end(key)
+        return fitness
+
+    def put(self, key:bytes, fitness:float):
+        if self.max_size <= 0:
+            return
+        self.__data[key] = fitness
+        self.__data.move_to_end(key)
+        while len(self.__data) > self.max_size:
+            self.__data.popitem(last=False)
+
+    def clear(self):
+        self.__data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            'size': len(self.__data),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
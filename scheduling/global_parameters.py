@@ -8,6 +8,10 @@ MAX_CLASSES_PER_DAY = 4
 
 NUMBER_OF_ITERATIONS = 100_000
 SAVE_FILE_NAME = 'test'
+# Замерять время этапов алгоритма и выводить замеры в конце работы `program.py`
+PROFILE = False
+# Хранить разобранные входные данные и `CompiledTask` в `TASK_CACHE_DIR` между запусками
+TASK_CACHE = True
 
 TEMP_DIR = Path(__file__).parent / 'temp'
 if not os.path.exists(TEMP_DIR):
@@ -18,3 +22,4 @@ if not os.path.exists(RESULT_DIR):
 POPS_DIR = TEMP_DIR / 'populations'
 if not os.path.exists(POPS_DIR):
     os.makedirs(POPS_DIR)
+TASK_CACHE_DIR = TEMP_DIR / 'tasks'
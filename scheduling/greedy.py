@@ -0,0 +1,152 @@
+'''
+    Быстрое жадное построение особей.
+    --------
+
+    Занятия по очереди ставятся в слот с наименьшим приростом штрафа
+    (как в `IndividualCreator` через `Evaluator.count_class_without_saving`),
+    но прирост считается не опросом счётчиков для каждого слота,
+    а по массивам занятости групп, преподавателей и аудиторий:
+        - прирост окон для каждого (сущность, день, пара) хранится готовым
+          и пересчитывается только для дня, в который поставлено занятие;
+        - накладки и превышение пар в день - сравнения с массивами занятости;
+        - переполнение - по загрузке (аудитория, время).
+    Ошибки из `STATIC_TERMS` берутся из `SchedulingTask.static_cost`.
+'''
+
+import numpy as np
+
+from compiled_task import CompiledTask
+from exceptions import TooMuchStudyClasses
+from json_schemas import FitnessWeights
+from vector_evaluation import count_windows, entity_schedule
+from global_parameters import CLASSES_PER_DAY as CPD, MAX_CLASSES_PER_DAY as MCPD
+
+
+def window_delta(occupied:np.ndarray) -> np.ndarray:
+    '''
+        Прирост количества окон при добавлении пары в каждое время дня
+        (0 для уже занятых пар). `occupied` - булев массив
+        с последней осью длины `CLASSES_PER_DAY`.
+    '''
+    added = occupied[..., None, :] | np.eye(CPD, dtype=bool)
+    delta = count_windows(added) - count_windows(occupied)[..., None]
+    return np.where(occupied, 0, delta)
+
+
+class GreedyConstructor:
+    '''
+        Жадное размещение занятий одной особи. Состояние - занятость
+        с учётом фиксированных занятий - копируется из исходного
+        в начале каждого `build`.
+    '''
+    compiled:CompiledTask
+    static_cost:list[np.ndarray]
+
+    def __init__(self, compiled:CompiledTask, weights:FitnessWeights,
+            static_cost:list[np.ndarray]):
+        self.compiled = ct = compiled
+        self.static_cost = static_cost
+        self.w = {name: getattr(weights, name) for name in ('g_window', 't_window',
+                'g_parallel_class', 't_parallel_class', 'g_excess_class',
+                'c_standard_overflow', 'c_special_overflow')}
+        self.room_weight = np.where(ct.room_default,
+                self.w['c_standard_overflow'], self.w['c_special_overflow'])
+        # группы каждого занятия: class_groups[group_start[c]:group_start[c+1]]
+        order = np.argsort(ct.pair_class, kind='stable')
+        self.class_groups = ct.pair_group[order]
+        self.group_start = np.searchsorted(ct.pair_class[order], np.arange(ct.n_classes + 1))
+
+        fixed = ct.fixed_class
+        time = np.full((1, ct.n_classes), -1, dtype=np.int64)
+        time[0, fixed] = ct.fixed_time
+        room = np.zeros((1, ct.n_classes), dtype=np.int64)
+        room[0, fixed] = ct.fixed_room
+        self.base_groups = entity_schedule(ct, ct.pair_group,
+                time[:, ct.pair_class], ct.n_groups)[0].astype(np.int64)
+        self.base_teachers = entity_schedule(ct, ct.class_teacher,
+                time, ct.n_teachers)[0].astype(np.int64)
+        self.base_load = entity_schedule(ct, room, time, ct.n_rooms,
+                ct.class_size)[0].reshape(ct.n_rooms, -1).astype(np.int64)
+
+    def build(self, rng:np.random.Generator) -> list[np.ndarray]:
+        '''
+            Разместить все свободные занятия. Возвращает для каждой
+            специализации из `compiled.specs` перестановку, где пустые
+            слоты - -1. Равные по штрафу слоты выбираются случайно.
+        '''
+        ct = self.compiled
+        self.groups = self.base_groups.copy()
+        self.teachers = self.base_teachers.copy()
+        self.load = self.base_load.copy()
+        self.g_window = window_delta(self.groups > 0)
+        self.t_window = window_delta(self.teachers > 0)
+        result = list()
+        for k, spec in enumerate(ct.specs):
+            if ct.spec_n_classes[k] > ct.spec_n_slots[k]:
+                raise TooMuchStudyClasses(f'Number of {spec.value} classes is '
+                        f'{ct.spec_n_classes[k]}, but number of slots is {ct.spec_n_slots[k]}')
+            start, n_slots = ct.spec_col_offset[k], ct.spec_n_slots[k]
+            rooms = ct.slot_room[start:start+n_slots]
+            times = ct.slot_time[start:start+n_slots]
+            ind = np.full(n_slots, -1, dtype=np.int64)
+            for class_num in rng.permutation(ct.spec_n_classes[k]):
+                c = ct.spec_class_offset[k] + class_num
+                cost = self.static_cost[k][class_num] + \
+                        self.time_cost(c)[times] + self.overflow_cost(c, rooms, times)
+                cost[ind >= 0] = np.inf
+                best = np.flatnonzero(np.isclose(cost, cost.min(), rtol=1e-12, atol=1e-9))
+                pos = rng.choice(best)
+                ind[pos] = class_num
+                self.place(c, rooms[pos], times[pos])
+            result.append(ind)
+        return result
+
+    def genome(self, rng:np.random.Generator) -> np.ndarray:
+        '''
+            Результат `build` в виде строки матрицы геномов: пустые слоты
+            каждой специализации заполняются номерами от кол-ва занятий по порядку
+            (как `IndividualCreator.create`).
+        '''
+        blocks = self.build(rng)
+        for block, n_classes in zip(blocks, self.compiled.spec_n_classes):
+            empty = block < 0
+            block[empty] = n_classes + np.arange(empty.sum())
+        return np.concatenate(blocks + [np.empty(0, dtype=np.int64)]).astype(self.compiled.gene_dtype)
+
+    def time_cost(self, c:int) -> np.ndarray:
+        '''
+            Прирост штрафа от групп и преподавателя занятия `c` для каждого времени недели.
+        '''
+        ct = self.compiled
+        groups = self.class_groups[self.group_start[c]:self.group_start[c+1]]
+        teacher = ct.class_teacher[c]
+        per_day = self.groups[groups].sum(-1, keepdims=True)
+        cost = self.w['g_window'] * self.g_window[groups].sum(0) + \
+                self.w['g_parallel_class'] * (self.groups[groups] > 0).sum(0) + \
+                self.w['g_excess_class'] * np.broadcast_to(per_day + 1 > MCPD,
+                        self.groups[groups].shape).sum(0) + \
+                self.w['t_parallel_class'] * (self.teachers[teacher] > 0)
+        if ct.teacher_no_windows[teacher]:
+            cost = cost + self.w['t_window'] * self.t_window[teacher]
+        return cost.ravel()
+
+    def overflow_cost(self, c:int, rooms:np.ndarray, times:np.ndarray) -> np.ndarray:
+        '''
+            Прирост переполнения аудиторий для слотов (`rooms`, `times`).
+        '''
+        load = self.load[rooms, times]
+        capacity = self.compiled.room_capacity[rooms]
+        size = self.compiled.class_size[c]
+        overflow = np.maximum(0, load + size - capacity) - np.maximum(0, load - capacity)
+        return self.room_weight[rooms] * overflow
+
+    def place(self, c:int, room:int, time:int):
+        ct = self.compiled
+        day, day_time = divmod(time, CPD)
+        groups = self.class_groups[self.group_start[c]:self.group_start[c+1]]
+        teacher = ct.class_teacher[c]
+        np.add.at(self.groups, (groups, day, day_time), 1)
+        self.g_window[groups, day] = window_delta(self.groups[groups, day] > 0)
+        self.teachers[teacher, day, day_time] += 1
+        self.t_window[teacher, day] = window_delta(self.teachers[teacher, day] > 0)
+        self.load[room, time] += ct.class_size[c]
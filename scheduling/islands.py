@@ -0,0 +1,210 @@
+'''
+    Островная модель генетического алгоритма.
+    --------
+
+    Несколько независимых популяций (островов) развиваются в отдельных
+    процессах, каждая со своими `AlgorithmParams` и зерном.
+    Каждые `migration_interval` поколений острова отправляют копии
+    `migration_size` лучших особей соседям по `MigrationTopology`
+    и заменяют ими своих худших особей. Миграция синхронная:
+    остров ждёт особей от всех соседей, поэтому результат при заданных
+    зёрнах не зависит от скорости процессов. Остров, остановившийся
+    досрочно (см. `StopReason`), сообщает об этом соседям, и они
+    продолжают без него.
+    Закончивший работу остров дочитывает свои входящие очереди до None
+    от каждого соседа, чтобы соседи не блокировались на записи в очередь,
+    которую никто не читает.
+    В конце залы славы островов сливаются в один. При прерывании (Ctrl-C)
+    острова присылают залы славы, накопленные к этому моменту,
+    и сливаются те, что успели прийти за `INTERRUPT_TIMEOUT` секунд.
+'''
+
+import multiprocessing as mp
+import os
+import queue
+import signal
+import traceback
+from pathlib import Path
+from time import perf_counter
+
+import numpy as np
+
+from json_schemas import TaskConfig, AlgorithmParams, IslandParams
+from algorithm import GeneticAlgorithm
+from enums import MigrationTopology, StopReason
+from task import SchedulingTask
+from population import Population
+from elite_archive import EliteArchive
+from vector_evaluation import VectorizedEvaluator
+
+
+# Сколько секунд после прерывания ждать залы славы островов
+INTERRUPT_TIMEOUT = 10.0
+
+
+def migration_targets(topology:MigrationTopology, islands:int) -> list[list[int]]:
+    '''
+        Для каждого острова - номера островов, куда отправляются его особи.
+    '''
+    if islands <= 1:
+        return [[] for _ in range(islands)]
+    if topology is MigrationTopology.RING:
+        return [[(i + 1) % islands] for i in range(islands)]
+    return [[j for j in range(islands) if j != i] for i in range(islands)]
+
+
+def island_params(config:TaskConfig) -> list[AlgorithmParams]:
+    '''
+        Параметры каждого острова: заданные в `config.islands.params`
+        или общие `config.params` с независимыми зёрнами,
+        порождёнными из `config.params.seed`.
+    '''
+    islands = config.islands
+    if islands.params is not None:
+        if len(islands.params) != islands.islands:
+            raise ValueError(f'Expected {islands.islands} island params, '
+                    f'got {len(islands.params)}')
+        return islands.params
+    seeds = np.random.SeedSequence(config.params.seed).spawn(islands.islands)
+    return [config.params.copy(update={'seed': int(seed.generate_state(1)[0])})
+            for seed in seeds]
+
+
+def _run_island(index:int, config:TaskConfig, cache_dir:Path|None, generations:int,
+        inboxes:dict[int, mp.Queue], outboxes:dict[int, mp.Queue], results:mp.Queue):
+    '''
+        `inboxes` и `outboxes` - очереди от соседей и к соседям по их номерам.
+    '''
+    inboxes = dict(inboxes)
+    stopped = set()
+    alg = None
+    try:
+        alg = GeneticAlgorithm(config, cache_dir=cache_dir)
+        alg.init_population()
+        # как и в `start_algorithm`, время считается после создания популяции
+        deadline = np.inf
+        if config.params.time_limit is not None:
+            deadline = perf_counter() + config.params.time_limit
+        interval = config.islands.migration_interval
+        done = 0
+        while done < generations:
+            step = generations - done if interval <= 0 else min(interval, generations - done)
+            _, reason = alg.start_algorithm(step, deadline=deadline)
+            done += step
+            if done >= generations or reason is not StopReason.GENERATIONS:
+                break
+            emigrants = alg.emigrants(config.islands.migration_size)
+            for neighbour, outbox in outboxes.items():
+                if neighbour not in stopped:
+                    outbox.put(emigrants)
+            # остановившийся сосед присылает None: он больше не ждётся
+            # и ему отправляется только завершающий None
+            for neighbour, inbox in list(inboxes.items()):
+                migrants = inbox.get()
+                if migrants is None:
+                    del inboxes[neighbour]
+                    stopped.add(neighbour)
+                else:
+                    alg.immigrate(migrants)
+        for outbox in outboxes.values():
+            outbox.put(None)
+        for inbox in inboxes.values():
+            while inbox.get() is not None:
+                pass
+        results.put((index, alg.hof.as_population(), alg.stop_reason, None))
+    except KeyboardInterrupt:
+        # сигнал может прийти и от терминала, и от `IslandModel.run`
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        for outbox in outboxes.values():
+            outbox.cancel_join_thread()
+        hall = alg.hof.as_population() if alg is not None else None
+        results.put((index, hall, StopReason.INTERRUPTED, None))
+    except BaseException:
+        results.put((index, None, None, traceback.format_exc()))
+    finally:
+        if alg is not None:
+            alg.close()
+
+
+class IslandModel:
+    '''
+        Запускает острова в отдельных процессах и собирает общий зал славы.
+    '''
+    config:TaskConfig
+    cache_dir:Path|None
+    params:list[AlgorithmParams]
+    task:SchedulingTask
+    evaluator:VectorizedEvaluator
+    hof:EliteArchive
+    stop_reasons:list[StopReason|None]
+
+    def __init__(self, config:TaskConfig, cache_dir:Path|None=None):
+        self.config = config
+        self.cache_dir = cache_dir
+        self.params = island_params(config)
+        self.task = SchedulingTask(config.data, cache_dir)
+        self.evaluator = VectorizedEvaluator(config.weights, self.task)
+        self.hof = EliteArchive(Population.empty(self.task.compiled), config.params.hof_size)
+        self.stop_reasons = [None] * config.islands.islands
+
+    @property
+    def islands(self) -> IslandParams:
+        return self.config.islands
+
+    def run(self, generations:int) -> EliteArchive:
+        '''
+            Выполнить `generations` поколений на каждом острове.
+            Возвращает общий зал славы (он же `hof`).
+        '''
+        n = self.islands.islands
+        targets = migration_targets(self.islands.topology, n)
+        # по очереди на каждую пару (откуда, куда): особи от каждого соседа
+        # читаются по порядку, независимо от скорости остальных островов
+        edges = {(i, j): mp.Queue() for i in range(n) for j in targets[i]}
+        results = mp.Queue()
+        processes = [mp.Process(target=_run_island, args=(
+                i, self.config.copy(update={'params': self.params[i]}), self.cache_dir, generations,
+                {j: edges[j, i] for j in range(n) if i in targets[j]},
+                {j: edges[i, j] for j in targets[i]}, results))
+                for i in range(n)]
+        for process in processes:
+            process.start()
+        halls = [None] * n
+        received = set()
+        try:
+            try:
+                self.__collect(results, halls, received)
+            except KeyboardInterrupt:
+                for process in processes:
+                    if process.is_alive():
+                        os.kill(process.pid, signal.SIGINT)
+                self.__collect(results, halls, received, INTERRUPT_TIMEOUT)
+                raise
+            for process in processes:
+                process.join()
+        finally:
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+            # при прерывании или ошибке сохраняется то, что успели прислать острова
+            for hall in halls:
+                if hall is not None:
+                    self.hof.update(hall)
+        return self.hof
+
+    def __collect(self, results:mp.Queue, halls:list, received:set[int],
+            timeout:float|None=None):
+        '''
+            Принимать результаты островов, пока не придут от всех
+            или пока `timeout` секунд не будет новых.
+        '''
+        while len(received) < len(halls):
+            try:
+                index, hall, reason, error = results.get(timeout=timeout)
+            except queue.Empty:
+                return
+            if error is not None:
+                raise RuntimeError(f'Island {index} failed:\n{error}')
+            received.add(index)
+            halls[index] = hall
+            self.stop_reasons[index] = reason
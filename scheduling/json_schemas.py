@@ -6,7 +6,7 @@ from pydantic import BaseModel, Field, root_validator
 
 from exceptions import TooMuchStudyClasses, NotEnoughSpecializations, ClassroomSpecializationError
 from global_parameters import DAYS_PER_WEEK, CLASSES_PER_DAY
-from enums import ClassroomFeature, ClassroomSpecialization, Degree
+from enums import ClassroomFeature, ClassroomSpecialization, Degree, MigrationTopology
 
 
 class Preferences(BaseModel):
@@ -139,13 +139,45 @@ class AlgorithmParams(BaseModel):
             population_size - количество особей
             hof_size - размер зала славы (хранилища лучших за всё время)
             p_mutation - вероятность мутации
-            p_crossover - вероятность скрещивания
+            p_crossover - вероятность скрещивания пары; за поколение особи дважды
+                    разбиваются на пары, в среднем N * p_crossover скрещиваний
+                    (N - количество отобранных особей)
             tourn_size - количество особей для турнирного отбора
             distance_threshold - растояние между расписаниями 
-                    (сумма пар в одно время в одной аудитории), 
-                    после которого они не считаются похожими
+                    (количество занятий, стоящих в разных аудиториях или в разное время), 
+                    после которого они не считаются похожими (None - без ниш)
             sharing_extent - степень наказание за схожесть расписаний
                     (заставляет алгоритм искать непохожие расписания) 
+            niche_sample - со сколькими случайными особями сравнивать каждую
+                    при подсчёте нишевого числа (не меньше размера популяции - со всеми)
+            fitness_cache_size - сколько приспособленностей уже оценённых особей
+                    хранить, чтобы не оценивать повторно одинаковые (0 - не хранить)
+            workers - количество процессов для оценки особей (1 - без пула процессов)
+            seed - зерно генератора случайных чисел (None - случайное)
+            local_search_top - скольких лучших особей улучшать локальным поиском
+                    каждое поколение (0 - без локального поиска)
+            local_search_moves - сколько обменов генов пробовать на одну особь
+            local_search_time - ограничение времени локального поиска
+                    за поколение в секундах (None - без ограничения)
+            time_limit - ограничение времени эволюции в секундах
+                    (None - без ограничения); отсчитывается от начала
+                    `start_algorithm`, т.е. после создания начальной популяции,
+                    в режиме островов - на каждом острове так же
+            stall_generations - остановиться, если зал славы не улучшался
+                    столько поколений подряд (None - не останавливаться)
+            target_fitness - остановиться, когда лучшая приспособленность
+                    не больше этого значения (None - не останавливаться)
+            adaptive_rates - подстраивать вероятности скрещивания и мутации
+                    каждой специализации по успешности потомков
+                    (`p_crossover` и `p_mutation` - начальные значения)
+            min_rate, max_rate - границы адаптивных вероятностей
+            targeted_mutation - доля мутаций, переставляющих в первую очередь
+                    занятия с накладками, переполнением аудиторий или окнами
+                    (0 - все обмены случайные)
+            checkpoint_generations - через сколько поколений сохранять контрольную
+                    точку, если задан файл сохранения (None - не по поколениям)
+            checkpoint_seconds - через сколько секунд сохранять контрольную точку
+                    (None - не по времени)
     '''
     population_size:int = Field(gt=0, alias='populationSize')
     proportion_by_algorithm:float = Field(ge=0, le=1, alias='pMadeByAlgorithm')
@@ -153,6 +185,42 @@ class AlgorithmParams(BaseModel):
     p_mutation:float = Field(ge=0.0, le=1.0, alias='pMutation')
     p_crossover:float = Field(ge=0.0, le=1.0, alias='pCrossover')
     tour_size:int = Field(gt=1, alias='tourSize')
+    distance_threshold:float|None = Field(None, gt=0, alias='distanceThreshold')
+    sharing_extent:float = Field(1.0, gt=0, alias='sharingExtent')
+    niche_sample:int = Field(32, ge=1, alias='nicheSample')
+    fitness_cache_size:int = Field(10_000, ge=0, alias='fitnessCacheSize')
+    workers:int = Field(1, ge=1)
+    seed:int|None = None
+    local_search_top:int = Field(0, ge=0, alias='localSearchTop')
+    local_search_moves:int = Field(200, ge=0, alias='localSearchMoves')
+    local_search_time:float|None = Field(None, gt=0, alias='localSearchTime')
+    time_limit:float|None = Field(None, gt=0, alias='timeLimit')
+    stall_generations:int|None = Field(None, gt=0, alias='stallGenerations')
+    target_fitness:float|None = Field(None, alias='targetFitness')
+    adaptive_rates:bool = Field(False, alias='adaptiveRates')
+    min_rate:float = Field(0.05, ge=0.0, le=1.0, alias='minRate')
+    max_rate:float = Field(0.95, ge=0.0, le=1.0, alias='maxRate')
+    targeted_mutation:float = Field(0.0, ge=0.0, le=1.0, alias='targetedMutation')
+    checkpoint_generations:int|None = Field(10, gt=0, alias='checkpointGenerations')
+    checkpoint_seconds:float|None = Field(None, gt=0, alias='checkpointSeconds')
+
+
+class IslandParams(BaseModel):
+    '''
+        Параметры островной модели (несколько популяций в разных процессах)
+            islands - количество островов (популяций)
+            topology - куда мигрируют лучшие особи
+            migration_interval - через сколько поколений происходит миграция
+                    (0 - острова не обмениваются особями)
+            migration_size - сколько лучших особей отправляется каждому соседу
+            params - параметры алгоритма для каждого острова
+                    (по умолчанию общие параметры с разными зёрнами)
+    '''
+    islands:int = Field(gt=0)
+    topology:MigrationTopology = MigrationTopology.RING
+    migration_interval:int = Field(ge=0, alias='migrationInterval')
+    migration_size:int = Field(ge=0, alias='migrationSize')
+    params:list[AlgorithmParams]|None = None
 
 
 class TaskData(BaseModel):
@@ -194,10 +262,12 @@ class TaskData(BaseModel):
 class TaskConfig(BaseModel):
     '''
         Всё, что может понадобиться для работы алгоритма, в одном месте
+        (`islands` - параметры островной модели, None - одна популяция)
     '''
     data:TaskData
     weights:FitnessWeights
     params:AlgorithmParams
+    islands:IslandParams|None = None
 
 
 class Pair(BaseModel):
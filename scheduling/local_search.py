@@ -0,0 +1,90 @@
+'''
+    Локальный поиск (меметический этап) для лучших особей поколения.
+    --------
+
+    Особь загружается в счётчики `Evaluator`, после чего случайные обмены
+    двух генов одной перестановки оцениваются через `Evaluator.try_swap`
+    (пересчитываются только два затронутых слота). Первый улучшающий обмен
+    применяется сразу (first improvement), поиск продолжается
+    до исчерпания бюджета ходов или времени.
+'''
+
+from time import perf_counter
+
+import numpy as np
+
+from individual import Individual
+from task import SchedulingTask
+from json_schemas import FitnessWeights
+from evaluation import Evaluator
+from profiling import Profiler, NO_PROFILER
+
+
+class LocalSearch:
+    '''
+        Улучшение особей обменами генов с подсчётом отдачи:
+            moves - сколько обменов оценено
+            improvements - сколько из них применено
+            gain - суммарное уменьшение приспособленности
+            seconds - затраченное время
+    '''
+    evaluator:Evaluator
+    moves:int
+    improvements:int
+    gain:float
+    seconds:float
+
+    def __init__(self, weights:FitnessWeights, scheduling_task:SchedulingTask,
+            profiler:Profiler=NO_PROFILER):
+        self.evaluator = Evaluator(weights, scheduling_task, profiler)
+        self.task = scheduling_task
+        self.moves = 0
+        self.improvements = 0
+        self.gain = 0.0
+        self.seconds = 0.0
+
+    def improve(self, ind:Individual, rng:np.random.Generator, max_moves:int,
+            deadline:float=np.inf) -> float:
+        '''
+            Улучшить особь на месте, оценив не больше `max_moves` обменов
+            и не позже `deadline` (по `time.perf_counter`).
+            Возвращает изменение приспособленности (не больше нуля).
+        '''
+        start = perf_counter()
+        specs = [spec for spec in ind if len(self.task.classes[spec]) > 0]
+        if not specs or max_moves <= 0:
+            return 0.0
+        # обмены выбираются в перестановках пропорционально числу занятий в них
+        n_classes = np.array([len(self.task.classes[spec]) for spec in specs], dtype=float)
+        spec_index = rng.choice(len(specs), size=max_moves, p=n_classes / n_classes.sum())
+        positions = rng.random((max_moves, 2))
+        delta = 0.0
+        moves = 0
+        self.evaluator.load_individual(ind)
+        for k, (u, v) in zip(spec_index, positions):
+            if perf_counter() >= deadline:
+                break
+            spec = specs[k]
+            arr = ind[spec]
+            i, j = int(u * len(arr)), int(v * len(arr))
+            moves += 1
+            if i == j or (arr[i] >= n_classes[k] and arr[j] >= n_classes[k]):
+                continue
+            change = self.evaluator.try_swap(ind, spec, i, j)
+            if change < 0:
+                self.improvements += 1
+                delta += change
+        self.evaluator.reset_counters()
+        self.moves += moves
+        self.gain -= delta
+        self.seconds += perf_counter() - start
+        return delta
+
+    def stats(self) -> dict:
+        return {
+            'moves': self.moves,
+            'improvements': self.improvements,
+            'gain': self.gain,
+            'seconds': self.seconds,
+            'gain_per_second': self.gain / self.seconds if self.seconds > 0 else 0.0,
+        }
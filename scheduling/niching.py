@@ -0,0 +1,88 @@
+'''
+    Разделение приспособленности (образование ниш).
+    --------
+
+    Расстояние между расписаниями - количество свободных занятий,
+    стоящих в разных аудиториях или в разное время (номер параллели
+    не учитывается), то есть число занятий минус количество занятий
+    с одинаковыми аудиторией и временем. Для каждой особи
+    считается нишевое число
+        m_i = sum_j sh(d_ij),  sh(d) = 1 - (d / threshold)^extent при d < threshold,
+    и приспособленность (минимизируемая) умножается на него, поэтому
+    особи из многочисленных ниш проигрывают в отборе.
+
+    Сравнение всех пар особей стоит O(P^2 * L), поэтому каждая особь
+    сравнивается только с `sample_size` случайно выбранными особями,
+    а сумма по остальным оценивается пропорционально:
+        m_i = 1 + (P - 1) / k * sum_{j из выборки, j != i} sh(d_ij),
+    где k - количество особей выборки, кроме самой i. Это O(P * k * L).
+    Если выборка не меньше популяции, сравниваются все пары.
+    Совпадения считаются сравнением векторов "занятие -> слот"
+    блоками строк, размер которых ограничен `BATCH_MEMORY`.
+'''
+
+import numpy as np
+
+from compiled_task import CompiledTask
+from vector_evaluation import BATCH_MEMORY
+
+
+def class_positions(ct:CompiledTask, genomes:np.ndarray) -> np.ndarray:
+    '''
+        Аудитория и время каждого свободного занятия одним числом
+        `аудитория * n_week_times + время` (-1 - занятие не поставлено):
+        массив формы (кол-во особей, кол-во свободных занятий).
+    '''
+    n_free = int(ct.spec_n_classes.sum())
+    dtype = np.int32 if ct.n_rooms * ct.n_week_times < 2**31 else np.int64
+    positions = np.full((len(genomes), n_free), -1, dtype=dtype)
+    rows, cols = np.nonzero(genomes < ct.col_n_classes)
+    positions[rows, genomes[rows, cols] + ct.col_class_offset[cols]] = \
+            ct.slot_room[cols] * ct.n_week_times + ct.slot_time[cols]
+    return positions
+
+
+def sample_matches(positions:np.ndarray, sample:np.ndarray) -> np.ndarray:
+    '''
+        Матрица количеств занятий, стоящих в одном слоте
+        у каждой особи и каждой особи выборки `sample` (номера строк).
+    '''
+    n, n_classes = positions.shape
+    others = positions[sample]
+    matches = np.empty((n, len(sample)), dtype=np.int64)
+    step = max(1, BATCH_MEMORY // max(1, len(sample) * n_classes))
+    for start in range(0, n, step):
+        block = positions[start:start+step]
+        matches[start:start+step] = (block[:, None, :] == others[None, :, :]).sum(-1)
+    return matches
+
+
+def niche_counts(positions:np.ndarray, threshold:float, extent:float,
+        rng:np.random.Generator, sample_size:int) -> np.ndarray:
+    '''
+        Оценка нишевого числа каждой особи по выборке из `sample_size` особей
+        (не меньше 1: особь входит в свою нишу).
+    '''
+    n = len(positions)
+    if sample_size >= n:
+        sample = np.arange(n)
+    else:
+        sample = rng.choice(n, size=sample_size, replace=False)
+    distance = positions.shape[1] - sample_matches(positions, sample)
+    share = np.where(distance < threshold, 1 - (distance / threshold) ** extent, 0.0)
+    # сама особь учитывается отдельно, даже если попала в выборку
+    is_self = np.arange(n)[:, None] == sample[None, :]
+    share[is_self] = 0.0
+    others = len(sample) - is_self.sum(1)
+    scale = np.divide(n - 1, others, out=np.zeros(n), where=others > 0)
+    return 1 + scale * share.sum(1)
+
+
+def shared_fitness(ct:CompiledTask, genomes:np.ndarray, fitness:np.ndarray,
+        threshold:float, extent:float, rng:np.random.Generator,
+        sample_size:int) -> np.ndarray:
+    '''
+        Приспособленность с учётом ниш (для отбора; зал славы хранит исходную).
+    '''
+    counts = niche_counts(class_positions(ct, genomes), threshold, extent, rng, sample_size)
+    return fitness * counts
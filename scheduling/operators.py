@@ -0,0 +1,136 @@
+'''
+    Генетические операторы над матрицей геномов `Population`.
+    --------
+
+    Операторы обрабатывают сразу все выбранные особи поколения:
+    случайные числа вытягиваются одним вызовом на всю матрицу,
+    а изменения применяются через индексирование numpy.
+'''
+
+import numpy as np
+
+
+# Ожидаемое количество обменов генов на одну перестановку при мутации
+SWAPS_PER_SPEC = 10
+# То же для перестановок с нарушениями, когда обмены начинаются только
+# с генов-нарушителей: небольшое число точечных обменов сохраняет
+# остальную часть расписания
+HOT_SWAPS_PER_SPEC = 2
+
+
+def spec_of_column(offsets:np.ndarray) -> np.ndarray:
+    '''
+        Номер специализации для каждого столбца генома.
+    '''
+    return np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+
+
+def swap_mutation(genomes:np.ndarray, offsets:np.ndarray, rows:np.ndarray,
+        rng:np.random.Generator, swaps:np.ndarray|float=SWAPS_PER_SPEC,
+        blocks:np.ndarray=None, hot:np.ndarray=None,
+        hot_swaps:float=HOT_SWAPS_PER_SPEC) -> np.ndarray:
+    '''
+        Мутация обменом генов для строк `rows` матрицы `genomes` (на месте).
+
+        Каждый ген перестановки длины n с вероятностью min(1, swaps/n)
+        меняется местами со случайным геном той же перестановки.
+        Обмены одной перестановки применяются по порядку генов, как при
+        последовательном обходе: за раунд выполняется не больше одного
+        обмена на перестановку, так что строки остаются перестановками.
+        args:
+            swaps - ожидаемое число обменов на перестановку,
+                    одно на все или по значению на каждую специализацию
+            blocks - какие перестановки мутируют: булев массив
+                    формы (len(rows), кол-во специализаций), по умолчанию все
+            hot - гены, которые нужно двигать в первую очередь: булев массив
+                    формы (len(rows), кол-во столбцов). Если в перестановке
+                    есть такие гены, обмены начинаются только с них, каждый
+                    с вероятностью min(1, hot_swaps/кол-во таких генов)
+        returns:
+            номера строк, в которых произошёл хотя бы один обмен
+    '''
+    rows = np.asarray(rows, dtype=np.int64)
+    sizes = np.diff(offsets)
+    if len(rows) == 0 or genomes.shape[1] == 0:
+        return rows[:0]
+    spec = spec_of_column(offsets)
+    p = np.minimum(1, np.broadcast_to(swaps, sizes.shape) / np.maximum(sizes, 1))
+    p = np.broadcast_to(p[spec], (len(rows), len(spec)))
+    if hot is not None:
+        n_hot = hot.astype(np.int64) @ (spec[:, None] == np.arange(len(sizes)))
+        p_hot = np.minimum(1, hot_swaps / np.maximum(n_hot, 1))
+        p = np.where(n_hot[:, spec] > 0, np.where(hot, p_hot[:, spec], 0), p)
+    hit = rng.random((len(rows), genomes.shape[1])) < p
+    if blocks is not None:
+        hit &= blocks[:, spec]
+    hit_rows, cols = np.nonzero(hit)
+    if len(cols) == 0:
+        return rows[:0]
+    others = offsets[spec[cols]] + (rng.random(len(cols)) * sizes[spec[cols]]).astype(np.int64)
+    # номер обмена внутри своей перестановки: `np.nonzero` идёт по строкам,
+    # а перестановки одной строки занимают непрерывные отрезки столбцов
+    group = hit_rows * len(sizes) + spec[cols]
+    starts = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+    rank = np.arange(len(group)) - np.repeat(starts, np.diff(np.r_[starts, len(group)]))
+    order = np.argsort(rank, kind='stable')
+    bounds = np.cumsum(np.bincount(rank))
+    hit_rows = rows[hit_rows]
+    for now in np.split(order, bounds[:-1]):
+        r, i, j = hit_rows[now], cols[now], others[now]
+        genomes[r, i], genomes[r, j] = genomes[r, j], genomes[r, i]
+    return np.unique(hit_rows)
+
+
+def order_crossover(genomes:np.ndarray, offsets:np.ndarray, pairs:np.ndarray,
+        rng:np.random.Generator, blocks:np.ndarray=None) -> np.ndarray:
+    '''
+        Упорядоченное скрещивание (OX) пар строк `pairs` формы (кол-во пар, 2)
+        матрицы `genomes` (на месте, строки пар не должны повторяться).
+
+        Для каждой пары и каждой перестановки выбирается отрезок [l, r):
+        потомок получает отрезок второго родителя, а остальные позиции,
+        начиная с r, заполняются генами первого родителя в порядке с r,
+        которых нет в отрезке. Принадлежность отрезку определяется
+        по обратной перестановке второго родителя, а порядок оставшихся
+        генов - устойчивой сортировкой маски.
+        args:
+            blocks - какие перестановки скрещиваются: булев массив
+                    формы (кол-во пар, кол-во специализаций), по умолчанию все
+        returns:
+            номера изменённых строк
+    '''
+    pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+    if len(pairs) == 0:
+        return pairs.ravel()
+    if blocks is None:
+        blocks = np.ones((len(pairs), len(offsets) - 1), dtype=bool)
+    for k, (start, stop) in enumerate(zip(offsets[:-1], offsets[1:])):
+        n = stop - start
+        first, second = pairs[blocks[:, k]].T
+        if n <= 0 or len(first) == 0:
+            continue
+        bounds = np.sort(rng.integers(n, size=(len(first), 2)), axis=1)
+        arr1 = genomes[first, start:stop].astype(np.int64)
+        arr2 = genomes[second, start:stop].astype(np.int64)
+        genomes[first, start:stop] = _ox_child(arr1, arr2, *bounds.T)
+        genomes[second, start:stop] = _ox_child(arr2, arr1, *bounds.T)
+    return pairs[blocks.any(1)].ravel()
+
+
+def _ox_child(arr1:np.ndarray, arr2:np.ndarray, l:np.ndarray, r:np.ndarray) -> np.ndarray:
+    n = arr1.shape[1]
+    k = np.arange(n)
+    # позиции, начиная с r по кругу
+    dest = (r[:, None] + k) % n
+    rot1 = np.take_along_axis(arr1, dest, axis=1)
+    rot2 = np.take_along_axis(arr2, dest, axis=1)
+    pos2 = np.empty_like(arr2)
+    np.put_along_axis(pos2, arr2, np.broadcast_to(k, arr2.shape), axis=1)
+    pos = np.take_along_axis(pos2, rot1, axis=1)
+    in_pocket = (pos >= l[:, None]) & (pos < r[:, None])
+    kept = np.take_along_axis(rot1, np.argsort(in_pocket, axis=1, kind='stable'), axis=1)
+    # после n - (r - l) оставленных генов по кругу идёт ровно отрезок [l, r)
+    src = np.where(k >= (n - (r - l))[:, None], rot2, kept)
+    child = np.empty_like(arr1)
+    np.put_along_axis(child, dest, src, axis=1)
+    return child
@@ -0,0 +1,202 @@
+'''
+    Параллельная оценка особей в пуле процессов.
+    --------
+
+    Массивы `CompiledTask` и весов один раз кладутся в разделяемую память
+    (`multiprocessing.shared_memory`) и подключаются процессами пула при старте.
+    Геномы поколения тоже передаются через разделяемую память:
+    процессы получают только номера строк и возвращают приспособленности.
+    Тот же пул строит жадные особи начальной популяции (`GreedyConstructor`
+    поверх `static_cost` из разделяемой памяти).
+'''
+
+import multiprocessing as mp
+import weakref
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from compiled_task import CompiledTask
+from vector_evaluation import VectorizedEvaluator
+from greedy import GreedyConstructor
+from json_schemas import FitnessWeights
+
+
+class SharedArrays:
+    '''
+        Массивы numpy в разделяемой памяти.
+        `spec` - описание для подключения к ним из других процессов.
+        Память освобождается в `close` или, если он не был вызван,
+        при сборке объекта мусора (и при выходе из интерпретатора).
+    '''
+    spec:dict[str, tuple[str, tuple[int, ...], str]]
+    arrays:dict[str, np.ndarray]
+
+    def __init__(self, arrays:dict[str, np.ndarray]):
+        self.spec = dict()
+        self.arrays = dict()
+        self.__memory = list()
+        self.__finalizer = weakref.finalize(self, SharedArrays.release, self.__memory)
+        for name, array in arrays.items():
+            array = np.asarray(array, order='C')
+            memory = SharedMemory(create=True, size=max(1, array.nbytes))
+            shared = np.ndarray(array.shape, dtype=array.dtype, buffer=memory.buf)
+            shared[...] = array
+            self.__memory.append(memory)
+            self.arrays[name] = shared
+            self.spec[name] = (memory.name, array.shape, array.dtype.str)
+
+    @staticmethod
+    def attach(spec:dict[str, tuple[str, tuple[int, ...], str]]) -> \
+            tuple[dict[str, np.ndarray], list[SharedMemory]]:
+        '''
+            Подключиться к массивам по `spec`. Возвращает массивы и объекты
+            памяти, которые нужно держать, пока массивы используются.
+        '''
+        arrays, memory = dict(), list()
+        for name, (memory_name, shape, dtype) in spec.items():
+            block = SharedMemory(name=memory_name)
+            memory.append(block)
+            arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        return arrays, memory
+
+    @staticmethod
+    def release(memory:list[SharedMemory]):
+        for block in memory:
+            block.unlink()
+            try:
+                block.close()
+            except BufferError:
+                # на блок ещё ссылаются массивы; отображение закроется вместе с ними
+                pass
+        memory.clear()
+
+    def close(self):
+        self.arrays.clear()
+        self.__finalizer()
+
+
+# Состояние процесса пула
+_worker = dict()
+
+
+def _init_worker(task_spec:dict, compiled_meta:dict, evaluator_spec:dict,
+        weights:FitnessWeights):
+    task_arrays, task_memory = SharedArrays.attach(task_spec)
+    evaluator_arrays, evaluator_memory = SharedArrays.attach(evaluator_spec)
+    compiled = CompiledTask.from_arrays(task_arrays, compiled_meta)
+    _worker['evaluator'] = VectorizedEvaluator.from_arrays(compiled, evaluator_arrays)
+    _worker['weights'] = weights
+    _worker['greedy'] = None
+    _worker['memory'] = task_memory + evaluator_memory
+    _worker['genomes'] = None
+
+
+def _create_genome(task:tuple[int, np.random.SeedSequence]) -> tuple[int, np.ndarray]:
+    index, seed = task
+    if _worker['greedy'] is None:
+        evaluator = _worker['evaluator']
+        _worker['greedy'] = GreedyConstructor(evaluator.compiled,
+                _worker['weights'], evaluator.static_cost())
+    return index, _worker['greedy'].genome(np.random.default_rng(seed))
+
+
+def _evaluate_rows(genomes_spec:dict, start:int, stop:int) -> np.ndarray:
+    cached = _worker['genomes']
+    if cached is None or cached[0] != genomes_spec:
+        arrays, memory = SharedArrays.attach(genomes_spec)
+        cached = _worker['genomes'] = (genomes_spec, arrays['genomes'], memory)
+    fitness, _ = _worker['evaluator'].evaluate_batch(cached[1][start:stop], with_errors=False)
+    return fitness
+
+
+class ParallelEvaluator:
+    '''
+        Оценивает геномы поколения в постоянном пуле из `workers` процессов.
+        Результат не зависит от числа процессов: каждая строка оценивается
+        тем же `VectorizedEvaluator`, а части собираются по порядку.
+    '''
+    workers:int
+    evaluator:VectorizedEvaluator
+
+    def __init__(self, evaluator:VectorizedEvaluator, workers:int, weights:FitnessWeights,
+            capacity:int=0):
+        '''
+            `capacity` - на сколько строк геномов сразу выделить разделяемую
+            память (обычно размер популяции); при нехватке блок увеличивается.
+        '''
+        self.workers = workers
+        self.evaluator = evaluator
+        self.__task_memory = SharedArrays(evaluator.compiled.arrays())
+        self.__evaluator_memory = SharedArrays(evaluator.arrays())
+        self.__genomes_memory = None
+        if capacity > 0:
+            self.__allocate_genomes(capacity)
+        self.__pool = mp.Pool(workers, initializer=_init_worker, initargs=(
+                self.__task_memory.spec,
+                evaluator.compiled.meta(),
+                self.__evaluator_memory.spec,
+                weights))
+        # пул останавливается, даже если `close` не будет вызван
+        self.__pool_finalizer = weakref.finalize(self, self.__pool.terminate)
+
+    def evaluate_batch(self, population_matrix:np.ndarray) -> np.ndarray:
+        '''
+            Приспособленности особей (строк `population_matrix`).
+        '''
+        n = len(population_matrix)
+        if n < 2 * self.workers:
+            fitness, _ = self.evaluator.evaluate_batch(population_matrix, with_errors=False)
+            return fitness
+        self.__share_genomes(population_matrix)
+        bounds = np.linspace(0, n, 2 * self.workers + 1).astype(int)
+        parts = self.__pool.starmap(_evaluate_rows, [(self.__genomes_memory.spec, start, stop)
+                for start, stop in zip(bounds[:-1], bounds[1:]) if start < stop])
+        return np.concatenate(parts)
+
+    def create_genomes(self, seeds:list[np.random.SeedSequence], 
+            progress=None) -> np.ndarray:
+        '''
+            Жадные особи (`GreedyConstructor.genome`), по одной на зерно.
+            Особи собираются по мере готовности, но строка `i` всегда
+            построена из `seeds[i]`, поэтому результат не зависит
+            от числа процессов. `progress(готово, всего)` вызывается
+            после каждой особи.
+        '''
+        compiled = self.evaluator.compiled
+        genomes = np.empty((len(seeds), compiled.n_genes), dtype=compiled.gene_dtype)
+        for done, (index, genome) in enumerate(self.__pool.imap_unordered(
+                _create_genome, enumerate(seeds)), 1):
+            genomes[index] = genome
+            if progress is not None:
+                progress(done, len(seeds))
+        return genomes
+
+    def __allocate_genomes(self, rows:int):
+        compiled = self.evaluator.compiled
+        if self.__genomes_memory is not None:
+            self.__genomes_memory.close()
+        self.__genomes_memory = SharedArrays(
+                {'genomes': np.zeros((rows, compiled.n_genes), dtype=compiled.gene_dtype)})
+
+    def __share_genomes(self, population_matrix:np.ndarray):
+        '''
+            Скопировать геномы в первые строки разделяемого блока. Блок
+            пересоздаётся (с запасом) только когда строк в нём не хватает,
+            поэтому процессы пула подключаются к нему заново лишь в этом случае.
+        '''
+        n = len(population_matrix)
+        memory = self.__genomes_memory
+        if memory is None or len(memory.arrays['genomes']) < n:
+            rows = 0 if memory is None else len(memory.arrays['genomes'])
+            self.__allocate_genomes(max(n, 2 * rows))
+        self.__genomes_memory.arrays['genomes'][:n] = population_matrix
+
+    def close(self):
+        self.__pool_finalizer.detach()
+        self.__pool.close()
+        self.__pool.join()
+        self.__task_memory.close()
+        self.__evaluator_memory.close()
+        if self.__genomes_memory is not None:
+            self.__genomes_memory.close()
@@ -0,0 +1,111 @@
+import numpy as np
+
+from enums import ClassroomSpecialization
+from individual import Individual
+from compiled_task import CompiledTask
+
+
+class Population:
+    '''
+        Поколение особей в виде одной матрицы геномов.
+            genomes - по строке на особь, перестановки специализаций `specs`
+                    идут подряд со смещениями `offsets`
+                    (как в `CompiledTask.individual_to_genome`)
+            fitness - приспособленность каждой особи (nan - не оценена)
+            dirty   - геном изменён после последней оценки и `fitness` устарела
+
+        `individual(i)` возвращает `Individual`, массивы которого - представления
+        строки матрицы, поэтому изменения особи видны в популяции.
+    '''
+    genomes:np.ndarray
+    fitness:np.ndarray
+    dirty:np.ndarray
+    specs:list[ClassroomSpecialization]
+    offsets:np.ndarray
+
+    def __init__(self, genomes:np.ndarray, specs:list[ClassroomSpecialization],
+            offsets:np.ndarray, fitness:np.ndarray=None, dirty:np.ndarray=None):
+        self.genomes = genomes
+        self.specs = specs
+        self.offsets = offsets
+        if fitness is None:
+            fitness = np.full(len(genomes), np.nan)
+        self.fitness = fitness
+        if dirty is None:
+            dirty = np.isnan(fitness)
+        self.dirty = dirty
+
+    @classmethod
+    def empty(cls, compiled:CompiledTask, size:int=0) -> 'Population':
+        return cls.from_genomes(compiled,
+                np.zeros((size, compiled.n_genes), dtype=compiled.gene_dtype))
+
+    @classmethod
+    def from_genomes(cls, compiled:CompiledTask, genomes:np.ndarray) -> 'Population':
+        return cls(genomes, compiled.specs, np.append(compiled.spec_col_offset, compiled.n_genes))
+
+    @classmethod
+    def from_individuals(cls, compiled:CompiledTask, inds) -> 'Population':
+        population = cls.empty(compiled, len(inds))
+        for i, ind in enumerate(inds):
+            population.set_individual(i, ind)
+        return population
+
+    def __len__(self) -> int:
+        return len(self.genomes)
+
+    def __getitem__(self, index) -> 'Population':
+        '''
+            Подмножество особей (копия строк для списков индексов и масок,
+            представление для срезов - как в numpy).
+        '''
+        if isinstance(index, (int, np.integer)):
+            index = [index]
+        return Population(self.genomes[index], self.specs, self.offsets,
+                self.fitness[index], self.dirty[index])
+
+    def copy(self) -> 'Population':
+        return Population(self.genomes.copy(), self.specs, self.offsets,
+                self.fitness.copy(), self.dirty.copy())
+
+    def append(self, other:'Population') -> 'Population':
+        return Population(np.concatenate((self.genomes, other.genomes)), self.specs,
+                self.offsets, np.concatenate((self.fitness, other.fitness)),
+                np.concatenate((self.dirty, other.dirty)))
+
+    def individual(self, i:int) -> Individual:
+        row = self.genomes[i]
+        ind = Individual({spec: row[self.offsets[k]:self.offsets[k+1]]
+                for k, spec in enumerate(self.specs)})
+        ind.fitness = float(self.fitness[i])
+        return ind
+
+    def individuals(self) -> list[Individual]:
+        return [self.individual(i) for i in range(len(self))]
+
+    def set_individual(self, i:int, ind:Individual):
+        for k, spec in enumerate(self.specs):
+            self.genomes[i, self.offsets[k]:self.offsets[k+1]] = ind[spec]
+        self.fitness[i] = ind.fitness
+        self.dirty[i] = np.isnan(ind.fitness)
+
+    def ranking(self) -> np.ndarray:
+        '''
+            Номера особей по возрастанию приспособленности (неоценённые - в конце).
+        '''
+        return np.argsort(self.fitness, kind='stable')
+
+    def best(self, k:int) -> np.ndarray:
+        '''
+            Номера `k` лучших особей по возрастанию приспособленности.
+        '''
+        if k >= len(self):
+            return self.ranking()
+        top = np.argpartition(self.fitness, k - 1)[:k] if k > 0 else np.array([], dtype=int)
+        return top[np.argsort(self.fitness[top], kind='stable')]
+
+    def sort(self):
+        order = self.ranking()
+        self.genomes = self.genomes[order]
+        self.fitness = self.fitness[order]
+        self.dirty = self.dirty[order]
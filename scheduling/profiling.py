@@ -0,0 +1,86 @@
+'''
+    Замеры времени работы отдельных этапов алгоритма.
+    --------
+
+    `Profiler` копит время и количество вызовов по именованным разделам
+    и счётчики событий (например, количество оценённых особей).
+    По умолчанию выключен: `section` тогда возвращает пустой контекст
+    и почти ничего не стоит.
+'''
+
+from contextlib import nullcontext
+from time import perf_counter
+
+
+class Section:
+    '''
+        Контекст замера одного раздела
+    '''
+    def __init__(self, profiler:'Profiler', name:str):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.add(self.name, perf_counter() - self.start)
+        return False
+
+
+class Profiler:
+    enabled:bool
+    times:dict[str, float]
+    calls:dict[str, int]
+    events:dict[str, int]
+
+    def __init__(self, enabled:bool=False):
+        self.enabled = enabled
+        self.reset()
+
+    def reset(self):
+        self.times = dict()
+        self.calls = dict()
+        self.events = dict()
+
+    def section(self, name:str) -> Section|nullcontext:
+        if not self.enabled:
+            return nullcontext()
+        return Section(self, name)
+
+    def add(self, name:str, seconds:float, calls:int=1):
+        self.times[name] = self.times.get(name, 0.0) + seconds
+        self.calls[name] = self.calls.get(name, 0) + calls
+
+    def count(self, name:str, n:int=1):
+        if self.enabled:
+            self.events[name] = self.events.get(name, 0) + n
+
+    def rate(self, event:str, section:str) -> float:
+        '''
+            Сколько событий `event` приходится на секунду раздела `section`.
+        '''
+        seconds = self.times.get(section, 0.0)
+        return self.events.get(event, 0) / seconds if seconds > 0 else 0.0
+
+    def report(self) -> dict[str, dict[str, float]]:
+        return {
+            'sections': {name: {'calls': self.calls[name], 'time': self.times[name]}
+                    for name in sorted(self.times, key=self.times.get, reverse=True)},
+            'events': dict(self.events),
+        }
+
+    def dump(self):
+        total = sum(time for name, time in self.times.items() if '.' not in name)
+        print(f'{"section":<32}{"calls":>10}{"time, s":>12}{"share":>8}')
+        for name, stats in self.report()['sections'].items():
+            # доля считается только для верхнеуровневых разделов (без точки в имени)
+            share = f'{stats["time"] / total:.1%}' if total and '.' not in name else ''
+            print(f'{name:<32}{stats["calls"]:>10}{stats["time"]:>12.3f}{share:>8}')
+        for name, n in self.events.items():
+            print(f'{name:<32}{n:>10}')
+
+
+# Выключенный профилировщик для значений по умолчанию
+NO_PROFILER = Profiler()
@@ -7,40 +7,77 @@ import json
 from pydantic import parse_obj_as
 
 from algorithm import GeneticAlgorithm
+from islands import IslandModel
 from json_schemas import *
-from global_parameters import NUMBER_OF_ITERATIONS, SAVE_FILE_NAME, TEMP_DIR, RESULT_DIR
+from task_cache import task_dir, load_task_data, save_task_data
+from global_parameters import NUMBER_OF_ITERATIONS, SAVE_FILE_NAME, TEMP_DIR, RESULT_DIR, PROFILE
+from global_parameters import TASK_CACHE, TASK_CACHE_DIR
 
 
 RESULT_FILE_NAME = 'result_' + SAVE_FILE_NAME + '.json'
-POP_FILE_NAME = 'population_' + SAVE_FILE_NAME +'.pkl'
+POP_FILE_NAME = 'population_' + SAVE_FILE_NAME +'.npz'
+DATA_FILES = {
+    'teachers': 'teachers.json',
+    'classrooms': 'classrooms.json',
+    'studentGroups': 'groups.json',
+    'studyClasses': 'classes.json',
+    'courses': 'courses.json',
+}
 
 
 def load_config():
+    '''
+        Возвращает конфигурацию и каталог кэша входных данных (None без кэша).
+        При совпадении содержимого входных файлов `TaskData` берётся из кэша.
+    '''
     config = dict()
-    data = dict()
-    data['teachers'] = json.loads((TEMP_DIR / 'teachers.json').read_text(encoding='utf-8'))
-    data['classrooms'] = json.loads((TEMP_DIR / 'classrooms.json').read_text(encoding='utf-8'))
-    data['studentGroups'] = json.loads((TEMP_DIR / 'groups.json').read_text(encoding='utf-8'))
-    data['studyClasses'] = json.loads((TEMP_DIR / 'classes.json').read_text())
-    data['courses'] = json.loads((TEMP_DIR / 'courses.json').read_text(encoding='utf-8'))
+    contents = {key: (TEMP_DIR / name).read_bytes() for key, name in DATA_FILES.items()}
+    cache_dir = None
+    data = None
+    if TASK_CACHE:
+        cache_dir = task_dir(TASK_CACHE_DIR, list(contents.values()))
+        data = load_task_data(cache_dir)
+    if data is None:
+        data = parse_obj_as(TaskData, {key: json.loads(content)
+                for key, content in contents.items()})
+        if cache_dir is not None:
+            save_task_data(data, cache_dir)
     config['params'] = json.loads((TEMP_DIR / 'params.json').read_text())
     config['weights'] = json.loads((TEMP_DIR / 'weights.json').read_text())
     config['data'] = data
-    return parse_obj_as(TaskConfig, config)
-
-config = load_config()
-alg = GeneticAlgorithm(config)
-alg.init_population()
-try:
-    alg.start_algorithm(NUMBER_OF_ITERATIONS,
-            verbose_interval=100,
-            save_file_name=POP_FILE_NAME)
-except KeyboardInterrupt:
-    pass
-finally:
-    best = alg.hof[0]
-    alg.evaluator.print_errors(best)
-    result = [i.dict() for i in alg.task.individual_to_schedule(best)]
+    if (TEMP_DIR / 'islands.json').exists():
+        config['islands'] = json.loads((TEMP_DIR / 'islands.json').read_text())
+    return parse_obj_as(TaskConfig, config), cache_dir
+
+def save_result(task, evaluator, best):
+    evaluator.print_errors(best)
+    result = [i.dict() for i in task.individual_to_schedule(best)]
     with open(RESULT_DIR / RESULT_FILE_NAME, 'w+', encoding='utf-8') as file:
         json.dump(result, file, ensure_ascii=False, indent=4)
     print('saved to ' + RESULT_FILE_NAME)
+
+config, cache_dir = load_config()
+if config.islands is not None:
+    model = IslandModel(config, cache_dir)
+    try:
+        model.run(NUMBER_OF_ITERATIONS)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if len(model.hof):
+            save_result(model.task, model.evaluator, model.hof.individual(0))
+else:
+    alg = GeneticAlgorithm(config, profile=PROFILE, cache_dir=cache_dir)
+    alg.init_population(verbose=True)
+    try:
+        alg.start_algorithm(NUMBER_OF_ITERATIONS,
+                verbose_interval=100,
+                save_file_name=POP_FILE_NAME)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        alg.close()
+        save_result(alg.task, alg.evaluator, alg.best_individual())
+        if PROFILE:
+            alg.profiler.dump()
+            print(f'evaluations/sec = {alg.profile_report()["evaluations_per_second"]:.1f}')
@@ -1,11 +1,17 @@
 from collections import defaultdict
+from functools import cached_property
+from itertools import chain
+from pathlib import Path
 
+import numpy as np
 from pydantic import parse_obj_as
 
 from enums import ClassroomSpecialization
-from json_schemas import TaskData, ClassroomsPairs
+from json_schemas import TaskData, ClassroomsPairs, FitnessWeights
 from json_schemas import StudyClassJSON, Teacher, StudentGroup, Classroom, Course, Preferences
 from individual import Individual
+from compiled_task import CompiledTask
+from task_cache import cached_compile
 from global_parameters import CLASSES_PER_DAY as CPD
 
 
@@ -47,12 +53,23 @@ class SchedulingTask:
     groups:dict[int, StudentGroup]
     courses:dict[int, Course]
     spec_to_n:dict[ClassroomSpecialization, int]
-    cl_by_pos:dict[ClassroomSpecialization, list[Classroom]]
-    cl_times:dict[ClassroomSpecialization, list[int]]
+    room_list:list[Classroom]
+    slot_room:dict[ClassroomSpecialization, np.ndarray]
+    slot_time:dict[ClassroomSpecialization, np.ndarray]
+    slot_parallel:dict[ClassroomSpecialization, np.ndarray]
 
     fixed:dict[int, dict[int, list[StudyClass]]]
+    static_cost:dict[ClassroomSpecialization, np.ndarray]|None
+    static_flat:np.ndarray|None
+    static_weights:FitnessWeights|None
+    cache_dir:Path|None
 
-    def __init__(self, data:TaskData):
+    def __init__(self, data:TaskData, cache_dir:Path|None=None):
+        '''
+            `cache_dir` - каталог кэша этих данных (см. `task_cache.task_dir`),
+            None - строить `compiled` без кэша.
+        '''
+        self.cache_dir = cache_dir
         self.classrooms = {cl.id: cl for cl in data.classrooms}
         self.teachers = {t.id: t for t in data.teachers}
         self.groups = {g.id: g for g in data.student_groups}
@@ -65,23 +82,59 @@ class SchedulingTask:
                 self.fixed[sc.fixed_classroom.id][sc.fixed_time].append(sc)
             else:
                 self.classes[sc.cl_spec].append(sc)
-        
-        self.cl_by_pos = defaultdict(list)
-        self.cl_times = defaultdict(list)
-        for cl in data.classrooms:
-            times = cl.available_times*cl.parallels
-            self.__remove_fixed_times(times, cl.id)
-            self.cl_by_pos[cl.specialization] += [cl] * len(times)
-            self.cl_times[cl.specialization] += times
-        
-        self.spec_to_n = {spec: len(self.cl_by_pos[spec]) for spec in self.cl_by_pos}
-    
-    def __remove_fixed_times(self, times:list[int], cl_id):
-        for fixed_time, classes in self.fixed[cl_id].items():
-            for _ in range(len(classes)):
-                if fixed_time not in times:
-                    break
-                times.remove(fixed_time)
+
+        self.room_list = list(self.classrooms.values())
+        self.__build_slots()
+        self.spec_to_n = {spec: len(self.slot_room[spec]) for spec in self.slot_room}
+        self.static_cost = None
+        self.static_flat = None
+        self.static_weights = None
+
+    def __build_slots(self):
+        '''
+            Таблица слотов каждой специализации: номер аудитории в `room_list`,
+            время и номер параллели. Слоты аудитории идут по параллелям,
+            внутри параллели - по `available_times`. Фиксированные занятия
+            занимают первые по порядку слоты со своими аудиторией и временем.
+        '''
+        rooms = self.room_list
+        n_times = np.array([len(cl.available_times) for cl in rooms], dtype=np.int64)
+        parallels = np.array([cl.parallels for cl in rooms], dtype=np.int64)
+        times = np.fromiter(chain.from_iterable(cl.available_times for cl in rooms),
+                dtype=np.int64, count=n_times.sum())
+        per_room = n_times * parallels
+        room = np.repeat(np.arange(len(rooms)), per_room)
+        k = np.arange(len(room)) - np.repeat(np.cumsum(per_room) - per_room, per_room)
+        time = times[np.repeat(np.cumsum(n_times) - n_times, per_room) + k % n_times[room]]
+        parallel = k // n_times[room]
+
+        room_index = {cl.id: i for i, cl in enumerate(rooms)}
+        fixed = [(room_index[cl_id], time) for cl_id, times in self.fixed.items()
+                for time, classes in times.items() for _ in classes]
+        fixed_room = np.array([r for r, _ in fixed], dtype=np.int64)
+        fixed_time = np.array([t for _, t in fixed], dtype=np.int64)
+        n_keys = int(np.concatenate((time, fixed_time, [0])).max()) + 1
+        key = room * n_keys + time
+        fixed_count = np.bincount(fixed_room * n_keys + fixed_time,
+                minlength=len(rooms) * n_keys)[key]
+        # номер слота среди слотов с той же (аудиторией, временем) считается только
+        # там, где есть фиксированные занятия; слот занят, если номер меньше их количества
+        busy = np.flatnonzero(fixed_count > 0)
+        order = busy[np.argsort(key[busy], kind='stable')]
+        sorted_key = key[order]
+        rank = np.arange(len(order)) - np.searchsorted(sorted_key, sorted_key)
+        free = np.ones(len(key), dtype=bool)
+        free[order] = rank >= fixed_count[order]
+
+        room_spec = [cl.specialization for cl in rooms]
+        specs = list(dict.fromkeys(room_spec))
+        slot_spec = np.array([specs.index(spec) for spec in room_spec], dtype=np.int64)[room]
+        self.slot_room, self.slot_time, self.slot_parallel = dict(), dict(), dict()
+        for i, spec in enumerate(specs):
+            mask = free & (slot_spec == i)
+            self.slot_room[spec] = room[mask]
+            self.slot_time[spec] = time[mask]
+            self.slot_parallel[spec] = parallel[mask]
     
     def __create_sc(self, sc_json:StudyClassJSON) -> StudyClass:
         return StudyClass(
@@ -94,8 +147,29 @@ class SchedulingTask:
                 self.classrooms[sc_json.fixed_classroom_id] if sc_json.fixed_classroom_id else None
         )
     
+    @cached_property
+    def compiled(self) -> CompiledTask:
+        if self.cache_dir is None:
+            return CompiledTask(self)
+        return cached_compile(self, self.cache_dir)
+
+    def build_static_cost(self, weights:FitnessWeights):
+        '''
+            Посчитать `static_cost[spec][class_num, pos]` - взвешенную сумму ошибок,
+            зависящих только от занятия и слота (предпочтения и недоступное время групп).
+            Матрицы - представления одного массива `static_flat`
+            (см. `CompiledTask.static_cost_flat`).
+            Повторный вызов с теми же весами ничего не пересчитывает.
+        '''
+        if self.static_cost is not None and self.static_weights == weights:
+            return
+        self.static_flat = self.compiled.static_cost_flat(weights)
+        self.static_cost = dict(zip(self.compiled.specs,
+                self.compiled.static_cost_views(self.static_flat)))
+        self.static_weights = weights
+
     def get_cl_wt(self, spec:ClassroomSpecialization, pos:int) -> tuple[Classroom, int]:
-        return self.cl_by_pos[spec][pos], self.cl_times[spec][pos]
+        return self.room_list[self.slot_room[spec][pos]], int(self.slot_time[spec][pos])
 
     def individual_to_schedule(self, individual:Individual) -> list[ClassroomsPairs]:
         rooms = defaultdict(list)
@@ -0,0 +1,113 @@
+'''
+    Кэш входных данных и `CompiledTask` на диске.
+    --------
+
+    Разбор входных json через pydantic и построение массивов `CompiledTask`
+    не зависят от весов и параметров алгоритма, поэтому при повторных
+    запусках на тех же данных их можно не повторять.
+    Для каждого набора данных в каталоге кэша (`task_dir`) хранятся:
+        - `data.pkl` - разобранный `TaskData`;
+        - `compiled/` - массивы `CompiledTask`, каждый отдельным `.npy`
+          (загружаются через `np.load(mmap_mode='r')`, без копирования
+          в память), и `meta.json` с остальными полями.
+    Ключ - sha256 содержимого входных файлов вместе с `CACHE_VERSION`.
+    Файлы сначала пишутся под временными именами и затем переименовываются,
+    поэтому параллельные запуски не видят недописанный кэш.
+'''
+
+import json
+import os
+import pickle
+import shutil
+from hashlib import sha256
+from pathlib import Path
+
+import numpy as np
+
+from compiled_task import CompiledTask
+from enums import ClassroomSpecialization
+from json_schemas import TaskData
+
+
+# Увеличивать при любом изменении `TaskData` или состава и смысла массивов `CompiledTask`
+CACHE_VERSION = 1
+DATA_FILE = 'data.pkl'
+COMPILED_SUBDIR = 'compiled'
+META_FILE = 'meta.json'
+
+
+def task_dir(cache_dir:Path, contents:list[bytes]) -> Path:
+    '''
+        Каталог кэша для входных файлов с содержимым `contents`.
+    '''
+    digest = sha256(f'v{CACHE_VERSION}'.encode())
+    for content in contents:
+        digest.update(len(content).to_bytes(8, 'little'))
+        digest.update(content)
+    return cache_dir / digest.hexdigest()
+
+
+def save_task_data(data:TaskData, directory:Path):
+    directory.mkdir(parents=True, exist_ok=True)
+    temp = directory / f'{DATA_FILE}.tmp{os.getpid()}'
+    temp.write_bytes(pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL))
+    os.replace(temp, directory / DATA_FILE)
+
+
+def load_task_data(directory:Path) -> TaskData|None:
+    path = directory / DATA_FILE
+    if not path.exists():
+        return None
+    return pickle.loads(path.read_bytes())
+
+
+def save_compiled(compiled:CompiledTask, directory:Path):
+    '''
+        Записать массивы задачи в `directory`. Если они уже
+        записаны (например, другим процессом), ничего не делает.
+    '''
+    target = directory / COMPILED_SUBDIR
+    if target.exists():
+        return
+    temp = directory / f'{COMPILED_SUBDIR}.tmp{os.getpid()}'
+    shutil.rmtree(temp, ignore_errors=True)
+    temp.mkdir(parents=True)
+    try:
+        for name, array in compiled.arrays().items():
+            np.save(temp / f'{name}.npy', array, allow_pickle=False)
+        meta = compiled.meta()
+        meta['specs'] = [spec.value for spec in meta['specs']]
+        (temp / META_FILE).write_text(json.dumps(meta))
+        os.replace(temp, target)
+    except OSError:
+        # каталог успел записать другой процесс
+        if not target.exists():
+            raise
+    finally:
+        shutil.rmtree(temp, ignore_errors=True)
+
+
+def load_compiled(directory:Path) -> CompiledTask|None:
+    '''
+        Загрузить задачу из `directory` (массивы только для чтения).
+        None, если массивы ещё не записаны.
+    '''
+    target = directory / COMPILED_SUBDIR
+    if not (target / META_FILE).exists():
+        return None
+    meta = json.loads((target / META_FILE).read_text())
+    meta['specs'] = [ClassroomSpecialization(spec) for spec in meta['specs']]
+    arrays = {path.stem: np.load(path, mmap_mode='r', allow_pickle=False)
+            for path in target.glob('*.npy')}
+    return CompiledTask.from_arrays(arrays, meta)
+
+
+def cached_compile(task, directory:Path) -> CompiledTask:
+    '''
+        `CompiledTask(task)` из кэша в `directory` или с записью в него.
+    '''
+    compiled = load_compiled(directory)
+    if compiled is None:
+        compiled = CompiledTask(task)
+        save_compiled(compiled, directory)
+    return compiled
@@ -1,4 +1,7 @@
 from collections import namedtuple
+from hashlib import blake2b
+
+import numpy as np
 
 from global_parameters import CLASSES_PER_DAY as CPD
 
@@ -17,3 +20,17 @@ def get_wd_and_dt(week_time: int) -> tuple[int, int]:
     '''
     return week_time // CPD, week_time % CPD
 
+
+
+def genome_key(genome:np.ndarray) -> bytes:
+    '''
+        Ключ генома особи для кэшей: 128-битный хэш его генов.
+
+        Get hashable key of individual genome.
+        args:
+            genome:np.ndarray - genes of individual (all specializations)
+        returns:
+            key:bytes - digest of genes
+    '''
+    genes = np.ascontiguousarray(genome, dtype=np.int32)
+    return blake2b(genes.tobytes(), digest_size=16).digest()
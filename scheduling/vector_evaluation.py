@@ -0,0 +1,293 @@
+'''
+    Векторизованный подсчёт ошибок расписания.
+    --------
+
+    Считает те же 14 ошибок, что и счётчики из `error_counters`
+    (в порядке `WTEC`), но не обходит гены в python, а собирает
+    занятость групп, преподавателей и аудиторий через `np.bincount`
+    по массивам `CompiledTask`.
+'''
+
+import numpy as np
+
+from individual import Individual
+from task import SchedulingTask
+from compiled_task import CompiledTask, ROOM_TERMS, TIME_TERMS, STATIC_TERMS
+from json_schemas import FitnessWeights
+from evaluation import WTEC
+from profiling import Profiler, NO_PROFILER
+from global_parameters import CLASSES_PER_DAY as CPD, MAX_CLASSES_PER_DAY as MCPD
+
+
+# Ограничение на размер промежуточных массивов занятости при пакетной оценке
+BATCH_MEMORY = 64 * 2**20
+
+TERM_INDEX = {name: i for i, name in enumerate(WTEC)}
+ROOM_COLUMNS = [TERM_INDEX[name] for name in ROOM_TERMS]
+TIME_COLUMNS = [TERM_INDEX[name] for name in TIME_TERMS]
+DYNAMIC_COLUMNS = [TERM_INDEX[name] for name in WTEC if name not in STATIC_TERMS]
+
+
+def count_windows(occupied:np.ndarray) -> np.ndarray:
+    '''
+        Количество окон в каждом дне. `occupied` - булев массив
+        с последней осью длины `CLASSES_PER_DAY`.
+    '''
+    n = occupied.sum(-1)
+    first = occupied.argmax(-1)
+    last = occupied.shape[-1] - 1 - occupied[..., ::-1].argmax(-1)
+    return np.where(n > 0, last - first + 1 - n, 0)
+
+
+def place_classes(ct:CompiledTask, genomes:np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    '''
+        Для каждой особи и каждого занятия (включая фиксированные) находит
+        его время и аудиторию. Неразмещённые занятия получают -1.
+    '''
+    n_inds = len(genomes)
+    rows, cols = np.nonzero(genomes < ct.col_n_classes)
+    classes = genomes[rows, cols] + ct.col_class_offset[cols]
+    class_time = np.full((n_inds, ct.n_classes), -1, dtype=np.int64)
+    class_room = np.full((n_inds, ct.n_classes), -1, dtype=np.int64)
+    class_time[:, ct.fixed_class] = ct.fixed_time
+    class_room[:, ct.fixed_class] = ct.fixed_room
+    class_time[rows, classes] = ct.slot_time[cols]
+    class_room[rows, classes] = ct.slot_room[cols]
+    return class_time, class_room
+
+
+def entity_schedule(ct:CompiledTask, entity:np.ndarray, time:np.ndarray,
+        n_entities:int, weights:np.ndarray=None) -> np.ndarray:
+    '''
+        Занятость сущностей (групп, преподавателей, аудиторий) по дням и парам:
+        массив формы (кол-во особей, `n_entities`, кол-во дней, `CLASSES_PER_DAY`).
+        `entity`, `time` и `weights` - массивы формы (кол-во особей, кол-во занятий).
+    '''
+    n_inds = len(time)
+    rows = np.broadcast_to(np.arange(n_inds)[:, None], time.shape)
+    placed = time >= 0
+    entity = np.broadcast_to(entity, time.shape)
+    index = (rows[placed] * n_entities + entity[placed]) * ct.n_week_times + time[placed]
+    if weights is not None:
+        weights = np.broadcast_to(weights, time.shape)[placed]
+    counts = np.bincount(index, weights=weights,
+            minlength=n_inds * n_entities * ct.n_week_times)
+    return counts.reshape(n_inds, n_entities, ct.n_days, CPD)
+
+
+def batch_size(ct:CompiledTask) -> int:
+    '''
+        Сколько особей можно оценить за раз, не выходя за `BATCH_MEMORY`.
+    '''
+    row_bytes = 8 * ct.n_week_times * (ct.n_groups + ct.n_teachers + ct.n_rooms) + \
+            16 * ct.n_classes + 8 * len(ct.pair_class)
+    return max(1, BATCH_MEMORY // max(1, row_bytes))
+
+
+def count_errors(ct:CompiledTask, genomes:np.ndarray, static_terms:bool=True,
+        profiler:Profiler=NO_PROFILER) -> np.ndarray:
+    '''
+        Ошибки для каждой особи: массив формы (кол-во особей, len(WTEC)).
+        Особи обрабатываются пачками по `batch_size` штук.
+        Если не `static_terms`, столбцы `STATIC_TERMS` остаются нулевыми.
+    '''
+    genomes = np.atleast_2d(genomes)
+    step = batch_size(ct)
+    if len(genomes) > step:
+        return np.concatenate([count_errors(ct, genomes[i:i+step], static_terms, profiler)
+                for i in range(0, len(genomes), step)])
+    errors = np.zeros((len(genomes), len(WTEC)), dtype=np.int64)
+    with profiler.section('vector.place'):
+        class_time, class_room = place_classes(ct, genomes)
+
+    with profiler.section('vector.groups'):
+        groups = entity_schedule(ct, ct.pair_group, class_time[:, ct.pair_class], ct.n_groups)
+        errors[:, TERM_INDEX['g_window']] = count_windows(groups > 0).sum((1, 2))
+        errors[:, TERM_INDEX['g_parallel_class']] = np.clip(groups - 1, 0, None).sum((1, 2, 3))
+        errors[:, TERM_INDEX['g_excess_class']] = \
+                np.clip(groups.sum(-1) - MCPD, 0, None).sum((1, 2))
+
+    with profiler.section('vector.teachers'):
+        teachers = entity_schedule(ct, ct.class_teacher, class_time, ct.n_teachers)
+        errors[:, TERM_INDEX['t_window']] = \
+                count_windows(teachers[:, ct.teacher_no_windows] > 0).sum((1, 2))
+        errors[:, TERM_INDEX['t_parallel_class']] = np.clip(teachers - 1, 0, None).sum((1, 2, 3))
+
+    with profiler.section('vector.rooms'):
+        rooms = entity_schedule(ct, class_room, class_time, ct.n_rooms, ct.class_size)
+        overflow = np.clip(rooms - ct.room_capacity[:, None, None], 0, None).astype(np.int64)
+        errors[:, TERM_INDEX['c_standard_overflow']] = overflow[:, ct.room_default].sum((1, 2, 3))
+        errors[:, TERM_INDEX['c_special_overflow']] = overflow[:, ~ct.room_default].sum((1, 2, 3))
+
+    if not static_terms:
+        return errors
+    with profiler.section('vector.static_terms'):
+        rows, classes = np.nonzero(class_time >= 0)
+        n_inds = len(genomes)
+        for column, values in zip(ROOM_COLUMNS,
+                ct.class_room_errors[classes, class_room[rows, classes]].T):
+            errors[:, column] = np.bincount(rows, weights=values, minlength=n_inds)
+        for column, values in zip(TIME_COLUMNS,
+                ct.class_time_errors[classes, class_time[rows, classes]].T):
+            errors[:, column] = np.bincount(rows, weights=values, minlength=n_inds)
+    return errors
+
+
+def conflict_genes(ct:CompiledTask, genomes:np.ndarray) -> np.ndarray:
+    '''
+        Булев массив формы генома: ген - свободное занятие, участвующее
+        в накладке групп или преподавателя, переполнении аудитории
+        или окне группы (преподавателя без разрешённых окон).
+        Занятия сопоставляются с группами, преподавателями и слотами
+        через `pair_class`/`pair_group`, `class_teacher` и `slot_room`/`slot_time`.
+    '''
+    genomes = np.atleast_2d(genomes)
+    if len(genomes) == 0:
+        return np.zeros(genomes.shape, dtype=bool)
+    step = batch_size(ct)
+    if len(genomes) > step:
+        return np.concatenate([conflict_genes(ct, genomes[i:i+step])
+                for i in range(0, len(genomes), step)])
+    n_inds = len(genomes)
+    rows = np.arange(n_inds)[:, None]
+    class_time, class_room = place_classes(ct, genomes)
+    placed = class_time >= 0
+    time = np.where(placed, class_time, 0)
+
+    pair_time = time[:, ct.pair_class]
+    groups = entity_schedule(ct, ct.pair_group, class_time[:, ct.pair_class], ct.n_groups)
+    g_windows = count_windows(groups > 0) > 0
+    bad_pairs = (groups.reshape(n_inds, ct.n_groups, -1)[rows, ct.pair_group, pair_time] > 1) | \
+            g_windows[rows, ct.pair_group, pair_time // CPD]
+    bad = np.bincount((rows * ct.n_classes + ct.pair_class).ravel(), weights=bad_pairs.ravel(),
+            minlength=n_inds * ct.n_classes).reshape(n_inds, ct.n_classes) > 0
+
+    teachers = entity_schedule(ct, ct.class_teacher, class_time, ct.n_teachers)
+    t_windows = (count_windows(teachers > 0) > 0) & ct.teacher_no_windows[:, None]
+    bad |= teachers.reshape(n_inds, ct.n_teachers, -1)[rows, ct.class_teacher, time] > 1
+    bad |= t_windows[rows, ct.class_teacher, time // CPD]
+
+    rooms = entity_schedule(ct, class_room, class_time, ct.n_rooms, ct.class_size)
+    overflow = (rooms > ct.room_capacity[:, None, None]).reshape(n_inds, ct.n_rooms, -1)
+    bad |= overflow[rows, np.where(placed, class_room, 0), time]
+    bad &= placed
+
+    free = genomes < ct.col_n_classes
+    gene_class = np.where(free, genomes + ct.col_class_offset, 0)
+    return free & bad[rows, gene_class]
+
+
+class VectorizedEvaluator:
+    '''
+        Замена `Evaluator` для оценки готовых особей: даёт ту же
+        приспособленность, но считает её по массивам `CompiledTask`.
+    '''
+    weights:np.ndarray
+    task:SchedulingTask
+    compiled:CompiledTask
+    static_flat:np.ndarray
+    col_static_base:np.ndarray
+    col_static_stride:np.ndarray
+    fixed_static_cost:float
+    profiler:Profiler
+
+    def __init__(self, weights:FitnessWeights, scheduling_task:SchedulingTask,
+            profiler:Profiler=NO_PROFILER):
+        self.profiler = profiler
+        self.weights = np.array(list(map(weights.__getattribute__, WTEC.keys())))
+        self.task = scheduling_task
+        self.compiled = ct = scheduling_task.compiled
+        # `static_cost` всех специализаций в одном массиве: ген `g` в столбце `col`
+        # стоит `static_flat[col_static_base[col] + g * col_static_stride[col]]`
+        # (тот же массив, что у `scheduling_task`, без копирования)
+        scheduling_task.build_static_cost(weights)
+        self.static_flat = scheduling_task.static_flat
+        sizes = ct.spec_n_classes * ct.spec_n_slots
+        spec_base = np.cumsum(sizes) - sizes
+        self.col_static_base = np.repeat(spec_base - ct.spec_col_offset, ct.spec_n_slots) + \
+                np.arange(ct.n_genes)
+        self.col_static_stride = np.repeat(ct.spec_n_slots, ct.spec_n_slots)
+        self.fixed_static_cost = ct.fixed_static_cost(weights)
+
+    def arrays(self) -> dict[str, np.ndarray]:
+        '''
+            Массивы, зависящие от весов (для передачи в другие процессы).
+        '''
+        return {
+            'weights': self.weights,
+            'static_flat': self.static_flat,
+            'col_static_base': self.col_static_base,
+            'col_static_stride': self.col_static_stride,
+            'fixed_static_cost': np.array(self.fixed_static_cost),
+        }
+
+    @classmethod
+    def from_arrays(cls, compiled:CompiledTask, 
+            arrays:dict[str, np.ndarray]) -> 'VectorizedEvaluator':
+        '''
+            Собрать оценщик из `CompiledTask` и результата `arrays`
+            без исходной `SchedulingTask`.
+        '''
+        evaluator = cls.__new__(cls)
+        evaluator.task = None
+        evaluator.profiler = NO_PROFILER
+        evaluator.compiled = compiled
+        evaluator.__dict__.update(arrays)
+        evaluator.fixed_static_cost = float(arrays['fixed_static_cost'])
+        return evaluator
+
+    def static_cost(self) -> list[np.ndarray]:
+        '''
+            Матрицы `SchedulingTask.static_cost` по порядку `compiled.specs`
+            (представления `static_flat`).
+        '''
+        return self.compiled.static_cost_views(self.static_flat)
+
+    def evaluate(self, ind:Individual) -> float:
+        fitness, _ = self.evaluate_batch(
+                self.compiled.individual_to_genome(ind)[None], with_errors=False)
+        return float(fitness[0])
+
+    def static_fitness(self, genomes:np.ndarray) -> np.ndarray:
+        '''
+            Взвешенная сумма ошибок из `STATIC_TERMS` для каждой особи.
+        '''
+        # пустые слоты указывают на последний, нулевой элемент `static_flat`
+        index = np.where(genomes < self.compiled.col_n_classes,
+                self.col_static_base + genomes * self.col_static_stride, -1)
+        return self.static_flat[index].sum(1) + self.fixed_static_cost
+
+    def evaluate_batch(self, population_matrix:np.ndarray, 
+            with_errors:bool=True) -> tuple[np.ndarray, np.ndarray|None]:
+        '''
+            Оценить сразу всё поколение.
+            args:
+                population_matrix - геномы особей по строкам
+                        (см. `CompiledTask.individuals_to_genomes`)
+                with_errors - считать ли матрицу ошибок; без неё ошибки
+                        из `STATIC_TERMS` берутся одной выборкой из `static_cost`
+            returns:
+                (fitness, errors) - вектор приспособленностей и матрица ошибок
+                        формы (кол-во особей, len(WTEC)) или None
+        '''
+        population_matrix = np.atleast_2d(population_matrix)
+        errors = count_errors(self.compiled, population_matrix, 
+                static_terms=with_errors, profiler=self.profiler)
+        with self.profiler.section('vector.static_cost'):
+            static = self.static_fitness(population_matrix)
+        fitness = errors[:, DYNAMIC_COLUMNS] @ self.weights[DYNAMIC_COLUMNS] + static
+        return fitness, (errors if with_errors else None)
+
+    def count_individual(self, ind:Individual) -> np.ndarray:
+        return count_errors(self.compiled, self.compiled.individual_to_genome(ind))[0]
+
+    def weight_errors(self, errors:np.ndarray) -> float:
+        return float(np.dot(self.weights, errors))
+
+    def get_errors(self, ind:Individual) -> dict[str, int]:
+        return {err_name: int(count) for err_name, count in
+                zip(WTEC.keys(), self.count_individual(ind))}
+
+    def print_errors(self, ind:Individual):
+        print(*[f'{name} = {count}' for name, count in self.get_errors(ind).items()],
+                sep='\n')
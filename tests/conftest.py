@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# модули пакета импортируются без префикса (`from task import SchedulingTask`)
+sys.path.insert(0, str(Path(__file__).parent.parent / 'scheduling'))
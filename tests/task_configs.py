@@ -0,0 +1,86 @@
+'''
+    Конфигурации небольших задач для тестов.
+'''
+
+import random
+
+from pydantic import parse_obj_as
+
+from json_schemas import TaskConfig
+
+
+WEIGHTS = ['gWindow', 'tWindow', 'gParallelClass', 'tParallelClass', 'gExcessClass',
+        'cStandardOverflow', 'cSpecialOverflow', 'gUnavailableTime', 'tPrefClassroom',
+        'tPrefTime', 'tPrefClassroomFeature', 'scPrefClassroom', 'scPrefTime',
+        'scPrefClassroomFeature']
+
+
+def make_config(n_times:int=42, **params) -> TaskConfig:
+    '''
+        Небольшая задача: 3 аудитории, 4 группы, 3 преподавателя, 40 занятий,
+        аудитории и группы доступны в моменты `range(n_times)`.
+    '''
+    no_prefs = {'classrooms': [], 'times': [], 'classroomFeatures': []}
+    rooms = [{'id': i, 'name': f'r{i}', 'capacity': 20 + 10 * i, 'parallels': 1,
+            'specialization': 'Default', 'features': [], 'availableTimes': list(range(n_times))}
+            for i in range(3)]
+    groups = [{'id': i, 'name': f'g{i}', 'size': 15, 'degree': 'Bachelor',
+            'availableTimes': list(range(n_times))} for i in range(4)]
+    teachers = [{'id': i, 'name': f't{i}', 'preferences': no_prefs, 'windowsAllowed': i % 2 == 0}
+            for i in range(3)]
+    classes = [{'courseId': 0, 'teacherId': k % 3, 'groupsIds': [k % 4, (k + 1) % 4],
+            'classroomSpecialization': 'Default', 'preferences': no_prefs,
+            'fixedTime': None, 'fixedClassroomId': None} for k in range(40)]
+    config = {
+        'data': {'teachers': teachers, 'classrooms': rooms, 'studentGroups': groups,
+                'studyClasses': classes, 'courses': [{'id': 0, 'name': 'c0'}]},
+        'params': {'populationSize': 20, 'pMadeByAlgorithm': 0.5, 'hallOfFameSize': 3,
+                'pMutation': 0.5, 'pCrossover': 0.5, 'tourSize': 3, 'seed': 1, **params},
+        'weights': {name: 1 for name in WEIGHTS},
+    }
+    return parse_obj_as(TaskConfig, config)
+
+
+def make_mixed_config(seed:int, n_classes:int=80, n_fixed:int=6, **params) -> TaskConfig:
+    '''
+        Случайная задача со всеми видами ошибок: несколько специализаций аудиторий,
+        параллели, особенности аудиторий, предпочтения, фиксированные занятия
+        и недоступное время.
+    '''
+    rand = random.Random(seed)
+    specs = ['Default', 'Computers', 'Sportsroom']
+    features = ['Projector', 'Chalk desk', 'Marker desk']
+    n_rooms, n_groups, n_teachers = 9, 6, 5
+
+    def preferences():
+        return {'classrooms': rand.sample(range(1, n_rooms + 1), rand.choice([0, 2])),
+                'times': rand.sample(range(42), rand.choice([0, 20])),
+                'classroomFeatures': rand.sample(features, rand.randint(0, 2))}
+
+    rooms = [{'id': i + 1, 'name': f'r{i}', 'capacity': rand.randint(10, 80),
+            'parallels': rand.choice([1, 2]), 'specialization': specs[i % 3],
+            'features': rand.sample(features, rand.randint(0, 3)),
+            'availableTimes': sorted(rand.sample(range(42), rand.randint(25, 42)))}
+            for i in range(n_rooms)]
+    groups = [{'id': i, 'name': f'g{i}', 'size': rand.randint(5, 30), 'degree': 'Bachelor',
+            'availableTimes': rand.sample(range(42), rand.randint(30, 42))} for i in range(n_groups)]
+    teachers = [{'id': i, 'name': f't{i}', 'preferences': preferences(),
+            'windowsAllowed': rand.random() < 0.5} for i in range(n_teachers)]
+    classes = []
+    for k in range(n_classes):
+        spec = rand.choice(specs)
+        room = rand.choice([room for room in rooms if room['specialization'] == spec])
+        fixed = k < n_fixed
+        classes.append({'courseId': 0, 'teacherId': rand.randrange(n_teachers),
+                'groupsIds': rand.sample(range(n_groups), rand.randint(1, 3)),
+                'classroomSpecialization': spec, 'preferences': preferences(),
+                'fixedTime': rand.choice(room['availableTimes']) if fixed else None,
+                'fixedClassroomId': room['id'] if fixed else None})
+    config = {
+        'data': {'teachers': teachers, 'classrooms': rooms, 'studentGroups': groups,
+                'studyClasses': classes, 'courses': [{'id': 0, 'name': 'c0'}]},
+        'params': {'populationSize': 20, 'pMadeByAlgorithm': 0.2, 'hallOfFameSize': 3,
+                'pMutation': 0.5, 'pCrossover': 0.5, 'tourSize': 3, 'seed': seed, **params},
+        'weights': {name: rand.randint(1, 10) for name in WEIGHTS},
+    }
+    return parse_obj_as(TaskConfig, config)
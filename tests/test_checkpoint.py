@@ -0,0 +1,26 @@
+import numpy as np
+
+from algorithm import GeneticAlgorithm
+from task_configs import make_mixed_config
+
+
+def test_checkpoint_resumes_exactly(tmp_path):
+    config = make_mixed_config(2, populationSize=30, hallOfFameSize=5)
+    path = str(tmp_path / 'pop.npz')
+    original = GeneticAlgorithm(config)
+    original.init_population()
+    original.start_algorithm(10, save_file_name=path)
+    original.checkpoint_writer.flush()
+    original.start_algorithm(10)
+    resumed = GeneticAlgorithm(config)
+    resumed.load_population(path)
+    resumed.start_algorithm(10)
+    try:
+        assert np.array_equal(original.population.genomes, resumed.population.genomes)
+        assert np.array_equal(original.population.fitness, resumed.population.fitness)
+        assert np.array_equal(original.hof.genomes, resumed.hof.genomes)
+        assert np.array_equal(original.hof.fitness, resumed.hof.fitness)
+        assert original.stall == resumed.stall
+    finally:
+        original.close()
+        resumed.close()
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from task import SchedulingTask
+from evaluation import Evaluator
+from vector_evaluation import VectorizedEvaluator
+from individual_creator import IndividualCreator
+from task_configs import make_mixed_config
+
+
+def make_individuals(seed:int):
+    config = make_mixed_config(seed)
+    task = SchedulingTask(config.data)
+    creator = IndividualCreator(config.weights, task, np.random.default_rng(seed))
+    inds = [creator.create_randomly() for _ in range(10)] + [creator.create() for _ in range(2)]
+    return config, task, inds
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_vectorized_evaluator_matches_evaluator(seed):
+    config, task, inds = make_individuals(seed)
+    evaluator = Evaluator(config.weights, task)
+    vectorized = VectorizedEvaluator(config.weights, task)
+    fitness, errors = vectorized.evaluate_batch(task.compiled.individuals_to_genomes(inds))
+    fast_fitness, _ = vectorized.evaluate_batch(
+            task.compiled.individuals_to_genomes(inds), with_errors=False)
+    for ind, fit, fast_fit, row in zip(inds, fitness, fast_fitness, errors):
+        assert evaluator.evaluate(ind) == pytest.approx(fit)
+        assert fast_fit == pytest.approx(fit)
+        evaluator.reset_counters()
+        evaluator.count_individual(ind)
+        assert [ec.get_count() for ec in evaluator.error_counters] == list(row)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_delta_swap_matches_full_evaluation(seed):
+    config, task, inds = make_individuals(seed)
+    evaluator = Evaluator(config.weights, task)
+    checker = Evaluator(config.weights, task)
+    rng = np.random.default_rng(seed)
+    specs = [spec for spec in task.spec_to_n if task.spec_to_n[spec] > 1]
+    for ind in inds[::3]:
+        for _ in range(50):
+            spec = specs[rng.integers(len(specs))]
+            i, j = rng.choice(task.spec_to_n[spec], size=2, replace=False)
+            before = checker.evaluate(ind)
+            commit = bool(rng.integers(2))
+            change = evaluator.delta_swap(ind, spec, i, j, commit=commit)
+            if not commit:
+                ind[spec][i], ind[spec][j] = ind[spec][j], ind[spec][i]
+            assert checker.evaluate(ind) - before == pytest.approx(change)
+            if not commit:
+                ind[spec][i], ind[spec][j] = ind[spec][j], ind[spec][i]
+        # после принятых обменов счётчики совпадают с полным пересчётом
+        counted = [ec.get_count() for ec in evaluator.error_counters]
+        assert evaluator.weight_errors(counted) == pytest.approx(checker.evaluate(ind))
@@ -0,0 +1,17 @@
+import numpy as np
+
+from operators import order_crossover
+
+
+def test_order_crossover_keeps_permutations():
+    rng = np.random.default_rng(0)
+    offsets = np.array([0, 1, 3, 33, 80])
+    n = 100
+    genomes = np.concatenate([np.stack([rng.permutation(size) for _ in range(n)])
+            for size in np.diff(offsets)], axis=1).astype(np.int16)
+    parents = genomes.copy()
+    pairs = rng.permutation(n).reshape(-1, 2)
+    order_crossover(genomes, offsets, pairs, rng)
+    assert not np.array_equal(genomes, parents)
+    for start, end in zip(offsets[:-1], offsets[1:]):
+        assert (np.sort(genomes[:, start:end], axis=1) == np.arange(end - start)).all()
@@ -0,0 +1,28 @@
+import numpy as np
+
+from algorithm import GeneticAlgorithm
+from vector_evaluation import conflict_genes
+from task_configs import make_config
+
+
+def test_conflict_genes_empty_batch():
+    alg = GeneticAlgorithm(make_config())
+    ct = alg.task.compiled
+    hot = conflict_genes(ct, np.empty((0, ct.n_genes), dtype=ct.gene_dtype))
+    assert hot.shape == (0, ct.n_genes)
+    assert hot.dtype == bool
+
+
+def test_hot_genes_without_guided_rows():
+    alg = GeneticAlgorithm(make_config(targetedMutation=1e-12))
+    alg.init_population()
+    assert not alg.hot_genes(alg.population, np.arange(len(alg.population))).any()
+    assert alg.hot_genes(alg.population, np.array([], dtype=np.int64)).shape == \
+            (0, alg.population.genomes.shape[1])
+
+
+def test_targeted_mutation_with_rare_mutations():
+    alg = GeneticAlgorithm(make_config(targetedMutation=1.0, pMutation=0.02))
+    alg.init_population()
+    alg.start_algorithm(50)
+    assert np.isfinite(alg.best_fitness())
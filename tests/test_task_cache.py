@@ -0,0 +1,16 @@
+import numpy as np
+
+from task import SchedulingTask
+from task_cache import save_compiled, load_compiled
+from task_configs import make_config
+
+
+def test_compiled_task_round_trip_past_first_week(tmp_path):
+    # слоты на восьмой день: n_days вычисляется из numpy-массивов
+    compiled = SchedulingTask(make_config(n_times=50).data).compiled
+    assert compiled.n_days > 7
+    save_compiled(compiled, tmp_path)
+    loaded = load_compiled(tmp_path)
+    assert loaded.meta() == compiled.meta()
+    for name, array in compiled.arrays().items():
+        assert np.array_equal(getattr(loaded, name), array)